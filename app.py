@@ -1,37 +1,230 @@
-from flask import Flask, render_template, request, redirect, url_for, session, send_file, flash
+from flask import Flask, current_app, render_template, request, redirect, url_for, session, send_file, flash, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import os
+import time
 import logging
 from io import BytesIO
-import pandas as pd
 from config import Config
-from utils.processing import (
-    extract_metadata, extract_tables_from_pdf, 
-    process_table_data, split_table, analyze_failures,
-    create_excel_download, create_bulk_excel_download
-)
-
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from utils.storage import UploadStore
+from utils.compression import init_compression
+from utils.sandbox import ExtractionPool, ExtractionLimitError, rss_bytes
+from utils.admission import AdmissionController, limit_extraction
+
+# pandas, pdfplumber and openpyxl arrive through utils.processing, utils.export,
+# utils.rollup and utils.shadow. Those are imported inside the code paths that
+# need them so building the app stays cheap; utils.warmup.warm_up() loads them
+# ahead of fork instead.
+
 logger = logging.getLogger(__name__)
-handler = logging.FileHandler('app.log')
-handler.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
 
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-logger.info(f"Ensured upload directory exists at: {app.config['UPLOAD_FOLDER']}")
+# HTTP status for JSON endpoints when a sandboxed extraction hits a limit
+EXTRACTION_LIMIT_STATUS = {'timeout': 504, 'memory': 422}
+
+def configure_logging():
+    """Console logging plus app.log, attached once per process"""
+    logging.basicConfig(level=logging.INFO)
+    if any(isinstance(h, logging.FileHandler) for h in logger.handlers):
+        return
+    handler = logging.FileHandler('app.log')
+    handler.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+def create_app(config_object=Config):
+    """Build the Flask app and its extraction services"""
+    started = time.perf_counter()
+
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    configure_logging()
+
+    # Ensure upload directory exists
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    logger.info(f"Ensured upload directory exists at: {app.config['UPLOAD_FOLDER']}")
+
+    # gzip/brotli for HTML/JSON/CSV, content-hashed immutable static assets
+    init_compression(app)
+
+    # Uploads stay resident (small in memory, large memory-mapped) and are
+    # written to UPLOAD_FOLDER in the background
+    app.extensions['uploads'] = UploadStore(app.config['UPLOAD_FOLDER'])
+
+    # Heavy extraction routes share a bounded, per-session fair admission
+    # queue. The limits apply per web worker, so the default splits the CPUs
+    # across the WEB_CONCURRENCY workers (the variable gunicorn also reads).
+    web_workers = app.config.setdefault('WEB_WORKERS', max(1, int(os.environ.get('WEB_CONCURRENCY', 1))))
+    admission = AdmissionController(
+        max_concurrent=app.config.get('EXTRACTION_MAX_CONCURRENT',
+                                      max(1, (os.cpu_count() or 2) // web_workers)),
+        max_queue=app.config.get('EXTRACTION_MAX_QUEUE', 16),
+        queue_timeout=app.config.get('EXTRACTION_QUEUE_TIMEOUT', 30.0),
+        max_queue_per_session=app.config.get('EXTRACTION_MAX_QUEUE_PER_SESSION')
+    )
+    app.extensions['extraction_admission'] = admission
+
+    # Extraction runs in recycled subprocesses with memory and wall-time
+    # limits so a pathological PDF cannot hang or bloat the web worker
+    extraction_pool = None
+    if app.config.get('EXTRACTION_SANDBOX', True):
+        extraction_pool = ExtractionPool(
+            workers=app.config.get('EXTRACTION_SANDBOX_WORKERS', admission.max_concurrent),
+            max_jobs=app.config.get('EXTRACTION_SANDBOX_MAX_JOBS', 50),
+            memory_limit_mb=app.config.get('EXTRACTION_SANDBOX_MEMORY_MB', 1024),
+            timeout=app.config.get('EXTRACTION_SANDBOX_TIMEOUT', 120.0)
+        )
+    app.extensions['extraction_pool'] = extraction_pool
+
+    # Optional shadow mode: diff a candidate extraction engine against the
+    # reference on a sampled share of /process requests, in the sandbox and
+    # only while an admission slot is free
+    shadow_runner = None
+    if app.config.get('SHADOW_ENGINE'):
+        from utils.shadow import ShadowRunner
+        shadow_runner = ShadowRunner(
+            app.config['SHADOW_ENGINE'],
+            sample_rate=app.config.get('SHADOW_SAMPLE_RATE', 0.0),
+            report_path=app.config.get('SHADOW_REPORT_PATH', 'shadow_report.jsonl'),
+            pool=extraction_pool,
+            admission=admission
+        )
+        logger.info(f"Shadow mode enabled for engine {app.config['SHADOW_ENGINE']}")
+    app.extensions['shadow_runner'] = shadow_runner
+
+    register_routes(app)
+
+    app.extensions['startup'] = {
+        'create_app_seconds': round(time.perf_counter() - started, 4),
+        'rss_mb_after_create': round((rss_bytes(os.getpid()) or 0) / (1024 * 1024), 1),
+    }
+    logger.info(f"Created app in {app.extensions['startup']['create_app_seconds']}s")
+    return app
+
+def register_routes(app):
+    app.add_url_rule('/', view_func=index, methods=['GET', 'POST'])
+    app.add_url_rule('/select', view_func=select_file, methods=['GET', 'POST'])
+    app.add_url_rule('/process', view_func=process_file)
+    app.add_url_rule('/download/<filename>', view_func=download_file)
+    app.add_url_rule('/download_violations/<filename>', view_func=download_violations)
+    app.add_url_rule('/bulk_download', view_func=bulk_download)
+    app.add_url_rule('/rollup', view_func=rollup)
+    app.add_url_rule('/admission_status', view_func=admission_status)
+    app.add_url_rule('/startup_status', view_func=startup_status)
+    app.register_error_handler(413, too_large)
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(500, server_error)
+
+def get_uploads():
+    return current_app.extensions['uploads']
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+def extract_upload_tables(upload, report_version=None):
+    """Extract tables from an upload, in the sandbox pool when enabled"""
+    extraction_pool = current_app.extensions['extraction_pool']
+    if extraction_pool:
+        # Workers open persisted uploads themselves rather than get a copy
+        return extraction_pool.extract_tables(upload.path or upload.buffer, report_version)
+    from utils.processing import extract_tables_from_pdf
+    return extract_tables_from_pdf(upload.open(), report_version)
+
+def extract_upload_metadata(upload, filename):
+    """Extract metadata from an upload, in the sandbox pool when enabled"""
+    extraction_pool = current_app.extensions['extraction_pool']
+    if extraction_pool:
+        return extraction_pool.extract_metadata(upload.path or upload.buffer, filename)
+    from utils.processing import extract_metadata
+    return extract_metadata(upload.open(), filename)
+
+def describe_limit_error(e):
+    """One-line user-facing description of a sandbox limit hit"""
+    error = e.to_dict()
+    return f"extraction {error['error']} ({error['message']})"
+
+def iter_extracted_files(filenames, purpose, skipped=None, raise_limits=False):
+    """Extract tables from each uploaded file on demand, skipping missing or empty ones.
+
+    When skipped is a list, (filename, reason) is appended for every file
+    that could not be extracted. With raise_limits, a sandbox limit hit
+    stops the iteration instead of skipping the file.
+    """
+    uploads = get_uploads()
+    for filename in filenames:
+        upload = uploads.get(filename)
+        if upload is None:
+            logger.error(f"File not found for {purpose}: {filename}")
+            if skipped is not None:
+                skipped.append((filename, "file not found"))
+            continue
+        try:
+            tables = extract_upload_tables(upload)
+        except ExtractionLimitError as e:
+            logger.error(f"Extraction limit hit on {filename} for {purpose}: {e.to_dict()}")
+            if raise_limits:
+                raise
+            if skipped is not None:
+                skipped.append((filename, describe_limit_error(e)))
+            continue
+        except Exception as e:
+            logger.error(f"Error processing {filename} for {purpose}: {str(e)}")
+            if skipped is not None:
+                skipped.append((filename, "extraction failed"))
+            continue
+        if any(tables.values()):
+            logger.debug(f"Processed {filename} for {purpose}")
+            yield filename, tables
+
+def extract_uploaded_files(filenames, purpose, skipped=None, raise_limits=False):
+    """Extract tables from each uploaded file, skipping missing or empty ones"""
+    return dict(iter_extracted_files(filenames, purpose, skipped, raise_limits))
+
+def flash_skipped(skipped):
+    """Tell the user which files an export left out"""
+    if skipped:
+        flash('Skipped ' + '; '.join(f'{filename}: {reason}' for filename, reason in skipped), 'warning')
+
+def requested_export_format():
+    """Export format from the query string, or None if unsupported here"""
+    from utils.export import EXCEL_FORMAT, EXPORT_FORMATS, parquet_available
+    fmt = request.args.get('format', EXCEL_FORMAT).lower()
+    if fmt not in EXPORT_FORMATS:
+        flash(f'Unsupported export format: {fmt}', 'warning')
+        return None
+    if fmt == 'parquet' and not parquet_available():
+        flash('Parquet export requires pyarrow to be installed', 'warning')
+        return None
+    return fmt
+
+def stream_archive(reports, fmt, download_stem, skipped=None):
+    """Stream a zip of per-table files while the reports are being extracted.
+
+    Headers are sent before a lazy reports generator runs, so the files it
+    skips are listed inside the archive rather than flashed.
+    """
+    from utils.export import iter_export_archive
+    # The generator extracts lazily, so it needs the app context while sending
+    return Response(
+        stream_with_context(iter_export_archive(reports, fmt, skipped)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{download_stem}_{fmt}.zip"'}
+    )
+
+def build_rollup(all_files_data):
+    """Weekly DAY/NIGHT rollup of the day reports among the extracted files"""
+    from utils.processing import parse_day_period
+    from utils.rollup import weekly_rollup
+    reports = []
+    for filename, tables in all_files_data.items():
+        if parse_day_period(filename)[0] is None:
+            continue
+        upload = get_uploads().get(filename)
+        if upload is None:
+            continue
+        _, block, feeder, _, _ = extract_upload_metadata(upload, filename)
+        reports.append({'filename': filename, 'block': block, 'feeder': feeder, 'tables': tables})
+    return weekly_rollup(reports)
 
-@app.route('/', methods=['GET', 'POST'])
 def index():
     logger.info(f"Accessed index route with method: {request.method}")
     if request.method == 'POST':
@@ -50,13 +243,12 @@ def index():
         for file in files:
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
                 try:
-                    file.save(filepath)
+                    upload = get_uploads().add(filename, file)
                     filenames.append(filename)
-                    logger.info(f"Successfully saved file: {filename} at {filepath}")
-                    logger.debug(f"File details - Size: {os.path.getsize(filepath)} bytes, "
-                               f"Content-Type: {file.content_type}")
+                    logger.info(f"Successfully stored file: {filename}")
+                    logger.debug(f"File details - Size: {upload.size} bytes, "
+                               f"SHA-256: {upload.sha256}, Content-Type: {file.content_type}")
                 except Exception as e:
                     logger.error(f"Failed to save file {filename}: {str(e)}", exc_info=True)
                     flash(f'Error saving file {filename}', 'danger')
@@ -65,6 +257,20 @@ def index():
                 logger.warning(f"Invalid file type: {file.filename}")
                 flash(f'Invalid file type: {file.filename}. Only PDF files are allowed.', 'warning')
         
+        # Later requests may be served by another worker that only sees disk;
+        # a lone worker keeps the uploads resident and lets the writes finish
+        # in the background
+        if current_app.config['WEB_WORKERS'] > 1:
+            persisted = []
+            for filename in filenames:
+                try:
+                    get_uploads().flush([filename])
+                    persisted.append(filename)
+                except Exception as e:
+                    logger.error(f"Failed to save file {filename}: {str(e)}")
+                    flash(f'Error saving file {filename}', 'danger')
+            filenames = persisted
+        
         if not filenames:
             logger.error("No valid PDF files were uploaded")
             flash('No valid PDF files uploaded', 'danger')
@@ -76,7 +282,6 @@ def index():
     
     return render_template('index.html')
 
-@app.route('/select', methods=['GET', 'POST'])
 def select_file():
     logger.info("Accessed select file route")
     if 'uploaded_files' not in session or not session['uploaded_files']:
@@ -98,7 +303,7 @@ def select_file():
     logger.debug(f"Showing selection page with files: {session['uploaded_files']}")
     return render_template('select.html', files=session['uploaded_files'])
 
-@app.route('/process')
+@limit_extraction()
 def process_file():
     logger.info("Accessed process file route")
     if 'selected_file' not in session:
@@ -106,9 +311,9 @@ def process_file():
         flash('No file selected. Please select a file first.', 'warning')
         return redirect(url_for('select_file'))
     
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], session['selected_file'])
-    if not os.path.exists(filepath):
-        logger.error(f"File not found at path: {filepath}")
+    upload = get_uploads().get(session['selected_file'])
+    if upload is None:
+        logger.error(f"File not found: {session['selected_file']}")
         flash('Selected file not found', 'danger')
         return redirect(url_for('select_file'))
     
@@ -116,15 +321,22 @@ def process_file():
     
     try:
         # Extract metadata
-        component_text, block, feeder, company, report_info = extract_metadata(
-            filepath, session['selected_file'])
+        component_text, block, feeder, company, report_info = extract_upload_metadata(
+            upload, session['selected_file'])
         logger.info(f"Extracted metadata - Component: {component_text}, "
                    f"Block: {block}, Feeder: {feeder}, Company: {company}")
         
         # Extract tables
-        tables = extract_tables_from_pdf(filepath)
+        tables = extract_upload_tables(upload, report_info['version'])
         logger.info(f"Extracted {len(tables)} table types from PDF")
         
+        shadow_runner = current_app.extensions['shadow_runner']
+        if shadow_runner:
+            shadow_runner.maybe_submit(upload.path or upload.buffer, session['selected_file'])
+        
+        import pandas as pd
+        from utils.processing import process_table_data, split_table, analyze_failures
+        
         # Process tables and split by odd/even harmonics
         processed_tables = {}
         for table_name, table_data in tables.items():
@@ -151,6 +363,7 @@ def process_file():
         combined_violations = pd.concat(violations) if violations else pd.DataFrame()
         logger.info(f"Total violations found: {len(combined_violations)}")
         
+        from utils.export import parquet_available
         return render_template('results.html',
                             filename=session['selected_file'],
                             metadata={
@@ -162,14 +375,19 @@ def process_file():
                             },
                             tables=processed_tables,
                             violations=combined_violations,
-                            violations_exist=not combined_violations.empty)
+                            violations_exist=not combined_violations.empty,
+                            parquet_export=parquet_available())
     
+    except ExtractionLimitError as e:
+        logger.error(f"Extraction limit hit on {session['selected_file']}: {e.to_dict()}")
+        flash(f'Could not process file: {describe_limit_error(e)}', 'danger')
+        return redirect(url_for('select_file'))
     except Exception as e:
         logger.error(f"Error processing file {session['selected_file']}: {str(e)}", exc_info=True)
         flash(f'Error processing file: {str(e)}', 'danger')
         return redirect(url_for('select_file'))
 
-@app.route('/download/<filename>')
+@limit_extraction()
 def download_file(filename):
     logger.info(f"Download request for file: {filename}")
     if 'uploaded_files' not in session or filename not in session['uploaded_files']:
@@ -177,19 +395,29 @@ def download_file(filename):
         flash('File not available for download', 'danger')
         return redirect(url_for('index'))
     
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    if not os.path.exists(filepath):
-        logger.error(f"File not found for download: {filepath}")
+    upload = get_uploads().get(filename)
+    if upload is None:
+        logger.error(f"File not found for download: {filename}")
         flash('File not found', 'danger')
         return redirect(url_for('index'))
     
+    fmt = requested_export_format()
+    if fmt is None:
+        return redirect(url_for('index'))
+    
     try:
-        tables = extract_tables_from_pdf(filepath)
+        # Extract before any response starts so failures can still be flashed
+        tables = extract_upload_tables(upload)
         if not any(tables.values()):
             logger.warning(f"No tables extracted from {filename}")
             flash('No data available for download', 'warning')
             return redirect(url_for('index'))
         
+        if fmt != 'xlsx':
+            logger.info(f"Streaming {fmt} download for {filename}")
+            return stream_archive([(filename, tables)], fmt, f"{filename.replace('.pdf', '')}_tables")
+        
+        from utils.processing import create_excel_download
         excel_data = create_excel_download(tables, filename)
         logger.info(f"Successfully created Excel download for {filename}")
         
@@ -205,7 +433,7 @@ def download_file(filename):
         flash(f'Error generating download: {str(e)}', 'danger')
         return redirect(url_for('index'))
 
-@app.route('/download_violations/<filename>')
+@limit_extraction()
 def download_violations(filename):
     logger.info(f"Violations download request for file: {filename}")
     if 'uploaded_files' not in session or filename not in session['uploaded_files']:
@@ -213,14 +441,17 @@ def download_violations(filename):
         flash('File not available for download', 'danger')
         return redirect(url_for('index'))
     
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    if not os.path.exists(filepath):
-        logger.error(f"File not found for violations download: {filepath}")
+    upload = get_uploads().get(filename)
+    if upload is None:
+        logger.error(f"File not found for violations download: {filename}")
         flash('File not found', 'danger')
         return redirect(url_for('index'))
     
     try:
-        tables = extract_tables_from_pdf(filepath)
+        tables = extract_upload_tables(upload)
+        
+        import pandas as pd
+        from utils.processing import process_table_data, analyze_failures
         violations = []
         
         for table_name, table_data in tables.items():
@@ -251,7 +482,7 @@ def download_violations(filename):
         flash(f'Error generating violations download: {str(e)}', 'danger')
         return redirect(url_for('process_file'))
 
-@app.route('/bulk_download')
+@limit_extraction()
 def bulk_download():
     logger.info("Bulk download requested")
     if 'uploaded_files' not in session or not session['uploaded_files']:
@@ -259,17 +490,19 @@ def bulk_download():
         flash('No files available for bulk download', 'warning')
         return redirect(url_for('index'))
     
-    all_files_data = {}
-    for filename in session['uploaded_files']:
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        try:
-            tables = extract_tables_from_pdf(filepath)
-            if any(tables.values()):
-                all_files_data[filename] = tables
-                logger.debug(f"Processed {filename} for bulk download")
-        except Exception as e:
-            logger.error(f"Error processing {filename} for bulk download: {str(e)}")
-            continue
+    fmt = requested_export_format()
+    if fmt is None:
+        return redirect(url_for('index'))
+    
+    if fmt != 'xlsx':
+        logger.info(f"Streaming {fmt} bulk download of {len(session['uploaded_files'])} files")
+        skipped = []
+        reports = iter_extracted_files(list(session['uploaded_files']), 'bulk download', skipped)
+        return stream_archive(reports, fmt, "bulk_harmonic_reports", skipped)
+    
+    skipped = []
+    all_files_data = extract_uploaded_files(session['uploaded_files'], 'bulk download', skipped)
+    flash_skipped(skipped)
     
     if not all_files_data:
         logger.error("No valid data found for bulk download")
@@ -277,7 +510,18 @@ def bulk_download():
         return redirect(url_for('index'))
     
     try:
-        excel_data = create_bulk_excel_download(all_files_data)
+        try:
+            rollup_summary = build_rollup(all_files_data)
+        except ExtractionLimitError as e:
+            logger.error(f"Skipping weekly rollup sheet: {e.to_dict()}")
+            flash(f'Weekly rollup sheet left out: {describe_limit_error(e)}', 'warning')
+            rollup_summary = None
+        except Exception as e:
+            # The per-report sheets are still worth having without the rollup
+            logger.error(f"Skipping weekly rollup sheet: {str(e)}", exc_info=True)
+            rollup_summary = None
+        from utils.processing import create_bulk_excel_download
+        excel_data = create_bulk_excel_download(all_files_data, rollup_summary)
         logger.info(f"Created bulk download with {len(all_files_data)} files")
         
         return send_file(
@@ -292,21 +536,62 @@ def bulk_download():
         flash(f'Error generating bulk download: {str(e)}', 'danger')
         return redirect(url_for('index'))
 
-@app.errorhandler(413)
+@limit_extraction()
+def rollup():
+    logger.info("Weekly rollup requested")
+    if 'uploaded_files' not in session or not session['uploaded_files']:
+        logger.warning("No files available for rollup")
+        return jsonify({'error': 'No files uploaded'}), 400
+    
+    try:
+        # A rollup quietly missing a day would be wrong, so limit hits fail it
+        all_files_data = extract_uploaded_files(session['uploaded_files'], 'rollup', raise_limits=True)
+        summary = build_rollup(all_files_data)
+        if summary.empty:
+            return jsonify({'error': 'No DAY/NIGHT reports with daily tables found'}), 404
+        
+        logger.info(f"Created weekly rollup with {len(summary)} rows")
+        from utils.rollup import rollup_to_response
+        return jsonify(rollup_to_response(summary))
+    
+    except ExtractionLimitError as e:
+        logger.error(f"Rollup stopped by extraction limit: {e.to_dict()}")
+        return jsonify(e.to_dict()), EXTRACTION_LIMIT_STATUS.get(e.kind, 500)
+    except Exception as e:
+        logger.error(f"Error generating rollup: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error generating rollup: {str(e)}'}), 500
+
+def admission_status():
+    status = current_app.extensions['extraction_admission'].stats()
+    extraction_pool = current_app.extensions['extraction_pool']
+    if extraction_pool:
+        status['sandbox'] = extraction_pool.stats()
+    shadow_runner = current_app.extensions['shadow_runner']
+    if shadow_runner:
+        status['shadow_dropped'] = shadow_runner.dropped
+    return jsonify(status)
+
+def startup_status():
+    status = dict(current_app.extensions['startup'])
+    status['rss_mb_now'] = round((rss_bytes(os.getpid()) or 0) / (1024 * 1024), 1)
+    pool = current_app.extensions.get('extraction_pool')
+    if pool is not None:
+        status['sandbox_rss_mb'] = pool.rss_mb()
+    return jsonify(status)
+
 def too_large(e):
     flash("File is too large. Maximum file size is 50MB.", 'danger')
     return redirect(url_for('index'))
 
-@app.errorhandler(404)
 def not_found(e):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
 def server_error(e):
     logger.error(f"Server error: {str(e)}", exc_info=True)
     flash('An internal server error occurred', 'danger')
     return redirect(url_for('index'))
 
 if __name__ == '__main__':
+    app = create_app()
     logger.info("Starting Flask application")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,161 @@
+import time
+import threading
+import pytest
+from flask import Flask, Response, send_file
+from io import BytesIO
+from utils.admission import AdmissionController, AdmissionRejected, limit_extraction
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+def _queue_in_order(controller, keys, admitted):
+    """Start one waiting thread per session key, each queued before the next starts"""
+    threads = []
+    for label, key in keys:
+        def run(label=label, key=key):
+            admitted_at = controller.acquire(key)
+            admitted.append(label)
+            controller.release(admitted_at)
+        queued = controller.stats()["queued"]
+        thread = threading.Thread(target=run)
+        thread.start()
+        _wait_until(lambda: controller.stats()["queued"] == queued + 1)
+        threads.append(thread)
+    return threads
+
+def _make_app(controller):
+    app = Flask(__name__)
+    app.secret_key = "test"
+
+    @app.route("/work")
+    @limit_extraction(controller)
+    def work():
+        return "done"
+
+    @app.route("/stream")
+    @limit_extraction(controller)
+    def stream():
+        return Response(iter([b"a", b"b"]), mimetype="text/plain")
+
+    @app.route("/file")
+    @limit_extraction(controller)
+    def file():
+        return send_file(BytesIO(b"data"), mimetype="application/octet-stream")
+
+    return app
+
+def test_sessions_are_served_round_robin():
+    controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5)
+    held = controller.acquire("A")
+    admitted = []
+    threads = _queue_in_order(controller, [("A1", "A"), ("A2", "A"), ("A3", "A"), ("B1", "B"), ("C1", "C")],
+                              admitted)
+
+    controller.release(held)
+    for thread in threads:
+        thread.join(5)
+
+    assert admitted == ["A1", "B1", "C1", "A2", "A3"]
+
+def test_session_queue_cap_rejects_own_excess():
+    controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5,
+                                     max_queue_per_session=2)
+    held = controller.acquire("A")
+    admitted = []
+    threads = _queue_in_order(controller, [("A1", "A"), ("A2", "A")], admitted)
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire("A")
+    assert excinfo.value.reason == "session queue full"
+
+    controller.release(held)
+    for thread in threads:
+        thread.join(5)
+    assert admitted == ["A1", "A2"]
+
+def test_full_queue_displaces_heaviest_session():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5,
+                                     max_queue_per_session=4)
+    held = controller.acquire("A")
+    admitted, displaced = [], []
+
+    def waiter(label, key):
+        try:
+            admitted_at = controller.acquire(key)
+        except AdmissionRejected as e:
+            displaced.append((label, e.reason))
+            return
+        admitted.append(label)
+        controller.release(admitted_at)
+
+    threads = []
+    for label, key in [("A1", "A"), ("A2", "A"), ("A3", "A"), ("A4", "A"), ("B1", "B"), ("C1", "C")]:
+        thread = threading.Thread(target=waiter, args=(label, key))
+        thread.start()
+        threads.append(thread)
+        _wait_until(lambda: controller.stats()["queued"] + len(displaced) == len(threads))
+
+    controller.release(held)
+    for thread in threads:
+        thread.join(5)
+
+    assert displaced == [("A4", "displaced by other sessions"), ("A3", "displaced by other sessions")]
+    assert admitted == ["A1", "B1", "C1", "A2"]
+
+def test_full_queue_returns_503_with_retry_after():
+    controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=5)
+    client = _make_app(controller).test_client()
+    held = controller.acquire("other")
+
+    response = client.get("/work")
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    controller.release(held)
+    assert client.get("/work").status_code == 200
+    assert controller.stats()["rejected"] == 1
+
+def test_queue_timeout_returns_503_with_retry_after():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+    client = _make_app(controller).test_client()
+    held = controller.acquire("other")
+
+    response = client.get("/work")
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    stats = controller.stats()
+    assert stats["queued"] == 0 and stats["sessions_waiting"] == 0
+    controller.release(held)
+
+def test_streamed_response_holds_slot_until_closed():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+    client = _make_app(controller).test_client()
+
+    response = client.get("/stream", buffered=False)
+    assert controller.stats()["active"] == 1
+    assert response.get_data() == b"ab"
+    response.close()
+
+    assert controller.stats()["active"] == 0
+
+def test_send_file_response_releases_slot_immediately():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+    client = _make_app(controller).test_client()
+
+    response = client.get("/file", buffered=False)
+
+    assert controller.stats()["active"] == 0
+    response.close()
+
+def test_try_acquire_only_takes_a_free_slot():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+    admitted_at = controller.try_acquire()
+    assert admitted_at is not None
+    assert controller.try_acquire() is None
+    controller.release(admitted_at)
+    assert controller.stats()["active"] == 0
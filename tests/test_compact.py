@@ -0,0 +1,74 @@
+from pandas.testing import assert_frame_equal
+from utils.processing import process_table_data
+from utils.compact import compact_table, expand_table, table_memory_bytes
+
+VOLTAGE_ROWS = [
+    ["2", "95", "1.0", "0.42", "0.38", "0.51", "Pass(42.00%)", "Pass(38.00%)", "Pass(51.00%)"],
+    ["3", "95", "1.0", "1.12", "0.44", "0.47", "Fail(112.00%)", "Pass(44.00%)", "Pass(47.00%)"],
+    ["2", "99", "1.5", "0.9", "1.61", "0.33", "Pass(60.00%)", "Fail(107.33%)", "Pass(22.00%)"],
+]
+
+def _processed(rows, table_name="Harmonic Voltage Daily"):
+    return process_table_data(rows, table_name)
+
+def test_round_trip_restores_processed_table():
+    df = _processed(VOLTAGE_ROWS)
+
+    compact = compact_table(df)
+
+    assert str(compact["Harmonic"].dtype) == "uint8"
+    assert str(compact["Measured_V1N"].dtype) == "float32"
+    assert list(compact["Result_V2N_Status"]) == ["Pass", "Pass", "Fail"]
+    assert compact["Result_V2N_Pct"].tolist() == [38.0, 44.0, 107.33000183105469]
+    assert_frame_equal(expand_table(compact), df)
+
+def test_na_results_round_trip():
+    rows = [row[:6] + ["N/A", "N/A", "N/A"] for row in VOLTAGE_ROWS]
+    rows[1] = VOLTAGE_ROWS[1]
+    df = _processed(rows)
+
+    compact = compact_table(df)
+
+    assert list(compact["Result_V1N_Status"]) == ["N/A", "Fail", "N/A"]
+    assert compact["Result_V1N_Pct"].isna().tolist() == [True, False, True]
+    assert_frame_equal(expand_table(compact), df)
+
+def test_mixed_decimal_results_are_kept_as_text():
+    rows = [list(row) for row in VOLTAGE_ROWS]
+    rows[0][6] = "Pass(42.0%)"
+    df = _processed(rows)
+
+    compact = compact_table(df)
+
+    assert "Result_V1N" in compact.columns
+    assert "Result_V1N_Status" not in compact.columns
+    assert "Result_V2N_Status" in compact.columns
+    assert_frame_equal(expand_table(compact), df)
+
+def test_unparseable_results_are_kept_as_text():
+    rows = [list(row) for row in VOLTAGE_ROWS]
+    rows[2][8] = "Pass (22.00%)"
+    df = _processed(rows)
+
+    compact = compact_table(df)
+
+    assert "Result_V3N" in compact.columns
+    assert_frame_equal(expand_table(compact), df)
+
+def test_compact_table_is_smaller():
+    rows = [
+        [str(h), str(limit), "1.0", f"0.{h:02d}", f"0.{h + 1:02d}", f"0.{h + 2:02d}",
+         f"Pass({h:.2f}%)", f"Pass({h + 1:.2f}%)", f"Pass({h + 2:.2f}%)"]
+        for limit in (95, 99) for h in range(2, 51)
+    ]
+    df = _processed(rows)
+
+    compact = compact_table(df)
+
+    assert table_memory_bytes(compact) * 2 < table_memory_bytes(df)
+    assert_frame_equal(expand_table(compact), df)
+
+def test_empty_table_round_trips():
+    df = _processed([])
+
+    assert_frame_equal(expand_table(compact_table(df)), df)
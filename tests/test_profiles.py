@@ -0,0 +1,95 @@
+import io
+import pytest
+from utils import processing
+from utils.processing import (ALTERNATE_TABLE_SETTINGS, DEFAULT_TABLE_SETTINGS, EXTRACTION_PROFILES,
+                              clear_extraction_profiles, extract_tables_from_pdf)
+from utils.warmup import WARM_UP_PAGES, _warm_up_pdf
+
+TABLE = "Harmonic Voltage Daily"
+
+def _row(harmonic, limit):
+    return f"{harmonic} {limit} 1.0 0.42 0.38 0.51 Pass(42.00%) Pass(38.00%) Pass(51.00%)"
+
+def _report(*table_pages):
+    return _warm_up_pdf([WARM_UP_PAGES[0]] + [list(page) for page in table_pages])
+
+def _harmonics(rows, limit):
+    return sorted(int(row[0]) for row in rows if str(row[1]).strip() == limit)
+
+@pytest.fixture(autouse=True)
+def profiles():
+    clear_extraction_profiles()
+    yield EXTRACTION_PROFILES
+    clear_extraction_profiles()
+
+@pytest.fixture
+def passes(monkeypatch):
+    """Record the strategy and table settings of every extraction pass"""
+    calls = []
+    run_extraction = processing._run_extraction
+
+    def spy(pdf, strategy="dual", table_settings=None):
+        calls.append((strategy, table_settings))
+        return run_extraction(pdf, strategy, table_settings)
+
+    monkeypatch.setattr(processing, "_run_extraction", spy)
+    return calls
+
+def test_text_layout_is_learned_and_reused(profiles, passes):
+    pdf = _report([TABLE.upper()] + [_row(h, 95) for h in range(2, 51)])
+
+    first = extract_tables_from_pdf(io.BytesIO(pdf))
+    (profile,) = profiles.values()
+    assert profile["strategy"] == "text"
+    assert profile["time_limits"] == {TABLE: ["95"]}
+
+    passes.clear()
+    second = extract_tables_from_pdf(io.BytesIO(pdf))
+
+    assert passes == [("text", DEFAULT_TABLE_SETTINGS)]
+    assert second == first
+    assert _harmonics(second[TABLE], "95") == list(range(2, 51))
+
+def test_short_fast_pass_falls_back_to_reference_pass(profiles, passes):
+    pdf = _report([TABLE.upper()] + [_row(h, 95) for h in range(2, 51)])
+    extract_tables_from_pdf(io.BytesIO(pdf))
+    (fingerprint,) = profiles
+    # A structured profile finds nothing in a text-only report
+    profiles[fingerprint] = {**profiles[fingerprint], "strategy": "structured",
+                             "table_settings": ALTERNATE_TABLE_SETTINGS[0]}
+
+    passes.clear()
+    tables = extract_tables_from_pdf(io.BytesIO(pdf))
+
+    assert passes[0] == ("structured", ALTERNATE_TABLE_SETTINGS[0])
+    assert passes[1] == ("dual", DEFAULT_TABLE_SETTINGS)
+    assert _harmonics(tables[TABLE], "95") == list(range(2, 51))
+    assert profiles[fingerprint]["strategy"] == "text"
+
+def test_gap_the_reference_pass_confirms_stops_falling_back(profiles, passes):
+    pdf = _report([TABLE.upper()] + [_row(h, 95) for h in range(2, 51) if h != 7])
+    extract_tables_from_pdf(io.BytesIO(pdf))
+
+    passes.clear()
+    extract_tables_from_pdf(io.BytesIO(pdf))
+    assert [strategy for strategy, _ in passes] == ["text", "dual"]
+    (profile,) = profiles.values()
+    assert profile["strategy"] == "text"
+    assert profile["missing_harmonics"] == {TABLE: {"95": [7]}}
+
+    passes.clear()
+    tables = extract_tables_from_pdf(io.BytesIO(pdf))
+    assert [strategy for strategy, _ in passes] == ["text"]
+    assert 7 not in _harmonics(tables[TABLE], "95")
+
+def test_99_percent_section_split_across_pages(profiles):
+    first_page = [TABLE.upper()] + [_row(h, 95) for h in range(2, 51)] + [_row(h, 99) for h in range(2, 21)]
+    # The second page repeats the last row of the first one
+    second_page = [_row(h, 99) for h in range(20, 51)]
+
+    tables = extract_tables_from_pdf(io.BytesIO(_report(first_page, second_page)))
+
+    assert _harmonics(tables[TABLE], "95") == list(range(2, 51))
+    assert _harmonics(tables[TABLE], "99") == list(range(2, 51))
+    (profile,) = profiles.values()
+    assert profile["time_limits"] == {TABLE: ["95", "99"]}
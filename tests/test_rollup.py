@@ -0,0 +1,62 @@
+from utils.rollup import weekly_rollup, rollup_to_response
+
+TABLE = "Harmonic Voltage Daily"
+
+def _rows(measured, allowed=3.0):
+    """Harmonic 5 at both time limits, all three phases at the same value"""
+    return [
+        ["5", str(limit), str(allowed), str(measured), str(measured), str(measured),
+         "Pass(10.00%)", "Pass(10.00%)", "Pass(10.00%)"]
+        for limit in (95, 99)
+    ]
+
+def _report(filename, measured, block="Not found", feeder="Not found"):
+    return {"filename": filename, "block": block, "feeder": feeder, "tables": {TABLE: _rows(measured)}}
+
+def _week(site, values):
+    """One DAY and one NIGHT report per day, taking values in order"""
+    values = iter(values)
+    return [
+        _report(f"{site}_DAY_{day}_{period}.pdf", next(values))
+        for day in range(1, 8) for period in ("DAY", "NIGHT")
+    ]
+
+def _row(summary, limit, phase="V1N"):
+    rows = summary[(summary["Time Limit (%)"] == limit) & (summary["Phase"] == phase)]
+    assert len(rows) == 1
+    return rows.iloc[0]
+
+def test_reports_from_two_sites_do_not_merge():
+    reports = _week("SITE_A", [1.0] * 14) + _week("SITE_B", [2.0] * 14)
+
+    summary = weekly_rollup(reports)
+
+    assert sorted(summary["Feeder"].unique()) == ["SITE A", "SITE B"]
+    for feeder, expected_max in (("SITE A", 1.0), ("SITE B", 2.0)):
+        site = summary[summary["Feeder"] == feeder]
+        assert set(site["Reports"]) == {14}
+        assert set(site["Days"]) == {7}
+        assert set(site["Max (%)"]) == {expected_max}
+
+    response = rollup_to_response(summary)
+    assert [group["feeder"] for group in response["groups"]] == ["SITE A", "SITE B"]
+
+def test_99_percent_row_is_judged_on_p99():
+    # One outlier among 14 reports: P95 stays under the 3% limit, P99 does not
+    summary = weekly_rollup(_week("SITE_A", [1.0] * 13 + [5.0]))
+
+    p95_row, p99_row = _row(summary, 95), _row(summary, 99)
+
+    assert p95_row["P95 (%)"] <= 3.0 < p95_row["P99 (%)"]
+    assert bool(p95_row["Compliant"])
+    assert not bool(p99_row["Compliant"])
+    assert p99_row["Reports Exceeded"] == 1
+
+def test_seven_day_report_is_excluded():
+    reports = _week("SITE_A", [1.0] * 14) + [_report("SITE_A_7_DAYS.pdf", 50.0)]
+
+    summary = weekly_rollup(reports)
+
+    assert set(summary["Reports"]) == {14}
+    assert summary["Max (%)"].max() == 1.0
+    assert bool(summary["Compliant"].all())
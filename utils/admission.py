@@ -0,0 +1,233 @@
+import math
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict, deque
+from functools import wraps
+from flask import current_app, make_response, session, request
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_MAX_QUEUE_PER_SESSION = 4
+DEFAULT_QUEUE_TIMEOUT = 30.0
+STATS_WINDOW = 500
+BUSY_MESSAGE = "The server is busy processing other reports. Please retry shortly."
+
+class AdmissionRejected(Exception):
+    """Raised when a heavy request cannot be admitted; carries a Retry-After hint"""
+
+    def __init__(self, retry_after, reason):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+class _Waiter:
+    __slots__ = ("event", "admitted", "displaced")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+        self.displaced = False
+
+class AdmissionController:
+    """Bounded concurrency for extraction work with a fair, bounded wait queue.
+
+    At most max_concurrent heavy requests run at once in this worker. Others
+    wait in per-session FIFO queues that are served round-robin, so one
+    session's bulk export cannot starve everyone else. A session may have
+    at most max_queue_per_session requests waiting. When max_queue requests
+    are waiting in total, a newcomer displaces the newest waiter of the
+    session with the most queued requests, so the heaviest session's excess
+    is rejected first; if no session has more queued than the newcomer
+    would, or a request waits longer than queue_timeout, AdmissionRejected
+    is raised instead.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, max_queue=DEFAULT_MAX_QUEUE,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT, max_queue_per_session=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        if max_queue_per_session is None:
+            max_queue_per_session = min(DEFAULT_MAX_QUEUE_PER_SESSION, max_queue)
+        self.max_queue_per_session = max_queue_per_session
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()
+        self._active = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._waits = deque(maxlen=STATS_WINDOW)
+        self._service_times = deque(maxlen=STATS_WINDOW)
+
+    def acquire(self, session_key):
+        """Block until a slot is free for this session; returns the admission time"""
+        enqueued = time.monotonic()
+        with self._lock:
+            if self._active < self.max_concurrent and not self._queued:
+                self._active += 1
+                self._admitted += 1
+                self._waits.append(0.0)
+                return enqueued
+
+            queue = self._queues.get(session_key)
+            waiting = len(queue) if queue else 0
+            if waiting >= self.max_queue_per_session:
+                self._rejected += 1
+                raise AdmissionRejected(self._retry_after(), "session queue full")
+
+            if self._queued >= self.max_queue and not self._displace(waiting):
+                self._rejected += 1
+                raise AdmissionRejected(self._retry_after(), "queue full")
+
+            waiter = _Waiter()
+            self._queues.setdefault(session_key, deque()).append(waiter)
+            self._queued += 1
+
+        waiter.event.wait(self.queue_timeout)
+
+        with self._lock:
+            if waiter.displaced:
+                self._rejected += 1
+                raise AdmissionRejected(self._retry_after(), "displaced by other sessions")
+
+            if not waiter.admitted:
+                queue = self._queues.get(session_key)
+                if queue is not None:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[session_key]
+                self._queued -= 1
+                self._rejected += 1
+                raise AdmissionRejected(self._retry_after(), "queue timeout")
+
+            admitted_at = time.monotonic()
+            self._waits.append(admitted_at - enqueued)
+            return admitted_at
+
+    def try_acquire(self):
+        """Take a free slot without waiting; returns the admission time or None.
+
+        For background work that should be dropped rather than queued.
+        """
+        with self._lock:
+            if self._active < self.max_concurrent and not self._queued:
+                self._active += 1
+                self._admitted += 1
+                return time.monotonic()
+        return None
+
+    def release(self, admitted_at):
+        """Free a slot and hand it to the next session in round-robin order"""
+        with self._lock:
+            self._service_times.append(time.monotonic() - admitted_at)
+            self._active -= 1
+            self._dispatch()
+
+    def _displace(self, waiting):
+        """Make room by rejecting the newest waiter of the session with the
+        most queued requests, if it has more than the newcomer would (lock held)"""
+        if not self._queues:
+            return False
+        session_key, queue = max(self._queues.items(), key=lambda item: len(item[1]))
+        if len(queue) <= waiting + 1:
+            return False
+        waiter = queue.pop()
+        if not queue:
+            del self._queues[session_key]
+        self._queued -= 1
+        waiter.displaced = True
+        waiter.event.set()
+        return True
+
+    def _dispatch(self):
+        """Admit waiters while slots are free (lock held)"""
+        while self._active < self.max_concurrent and self._queues:
+            session_key, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session_key)
+            else:
+                del self._queues[session_key]
+            self._queued -= 1
+            self._active += 1
+            self._admitted += 1
+            waiter.admitted = True
+            waiter.event.set()
+
+    def _retry_after(self):
+        """Seconds until a queued request would likely be admitted (lock held)"""
+        if self._service_times:
+            mean_service = sum(self._service_times) / len(self._service_times)
+        else:
+            mean_service = 1.0
+        rounds = (self._queued + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(mean_service * rounds))
+
+    def stats(self):
+        """Current load and recent wait times for monitoring"""
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "active": self._active,
+                "queued": self._queued,
+                "sessions_waiting": len(self._queues),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "max_queue_per_session": self.max_queue_per_session,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "wait_p50_seconds": round(_percentile(waits, 0.50), 4),
+                "wait_p95_seconds": round(_percentile(waits, 0.95), 4),
+                "wait_max_seconds": round(waits[-1], 4) if waits else 0.0,
+            }
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+def _session_key():
+    """Stable per-browser key used for fair scheduling"""
+    if 'client_id' not in session:
+        session['client_id'] = uuid.uuid4().hex
+    return session['client_id'] or request.remote_addr
+
+def limit_extraction(controller=None):
+    """Route decorator that runs the view only once the controller admits it.
+
+    Without an explicit controller, the app's extensions['extraction_admission']
+    is looked up per request. Streamed responses hold the slot until they
+    have been fully sent, so exports stay accounted for while their
+    generator is still extracting.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            admission = controller or current_app.extensions['extraction_admission']
+            try:
+                admitted_at = admission.acquire(_session_key())
+            except AdmissionRejected as e:
+                logger.warning(f"Rejected {request.path} ({e.reason}), retry after {e.retry_after}s")
+                return BUSY_MESSAGE, 503, {'Retry-After': str(e.retry_after)}
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                admission.release(admitted_at)
+                raise
+            # Generator bodies still extract while sending; everything else
+            # (including send_file, which skips close callbacks) is built here
+            if response.is_streamed and not response.direct_passthrough:
+                response.call_on_close(lambda: admission.release(admitted_at))
+            else:
+                admission.release(admitted_at)
+            return response
+        return wrapper
+    return decorator
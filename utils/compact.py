@@ -0,0 +1,141 @@
+import re
+import numpy as np
+import pandas as pd
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+RESULT_STATUSES = ["Pass", "Fail", "N/A"]
+STATUS_SUFFIX = "_Status"
+PERCENT_SUFFIX = "_Pct"
+SMALL_INT_COLUMNS = ["Harmonic", "Time Percent Limit[%]"]
+
+# Canonical result cell as written by the extractors, e.g. "Pass(0.12%)"
+RESULT_PATTERN = re.compile(r'^(Pass|Fail)\((\d+(?:\.(\d+))?)%\)$')
+
+def _format_result(status, percent, decimals):
+    """Rebuild a display result string from its status and percent"""
+    if status == "N/A":
+        return "N/A"
+    return f"{status}({percent:.{decimals}f}%)"
+
+def _split_result_column(values):
+    """Split a Result_* column into status, percent and shared decimal count.
+
+    Returns None when the column cannot be rebuilt byte-for-byte from the
+    split form (mixed decimal places, stray whitespace, unknown tokens).
+    """
+    statuses = []
+    percents = []
+    decimals = set()
+
+    for value in values:
+        text = str(value)
+        if text == "N/A":
+            statuses.append("N/A")
+            percents.append(np.nan)
+            continue
+
+        match = RESULT_PATTERN.match(text)
+        if not match:
+            return None
+
+        statuses.append(match.group(1))
+        percents.append(float(match.group(2)))
+        decimals.add(len(match.group(3) or ""))
+
+    if len(decimals) > 1:
+        return None
+
+    decimal_places = decimals.pop() if decimals else 0
+    status = pd.Categorical(statuses, categories=RESULT_STATUSES)
+    percent = np.asarray(percents, dtype='float32')
+
+    # Guard against percents that float32 cannot carry at this precision
+    for s, p, original in zip(statuses, percent, values):
+        if _format_result(s, p, decimal_places) != str(original):
+            return None
+
+    return status, percent, decimal_places
+
+def _narrow_float(series):
+    """Downcast a float column to float32 if it survives the round trip"""
+    narrowed = series.astype('float32')
+    restored = narrowed.astype(str).astype('float64')
+    if restored.equals(series.astype('float64')):
+        return narrowed
+    return series
+
+def compact_table(df):
+    """Convert a processed table into the compact typed schema.
+
+    Harmonic and time limit become uint8, measurements float32 and every
+    Result_* column is split into a Pass/Fail/N/A categorical plus a float32
+    percent. Columns that would not convert back losslessly are kept as-is.
+    """
+    compact = pd.DataFrame(index=df.index)
+    result_decimals = {}
+
+    for col in df.columns:
+        series = df[col]
+
+        if col in SMALL_INT_COLUMNS:
+            numeric = pd.to_numeric(series, errors='coerce')
+            if numeric.notna().all() and (numeric % 1 == 0).all() and numeric.between(0, 255).all():
+                compact[col] = numeric.astype('uint8')
+            else:
+                compact[col] = series
+
+        elif col.startswith('Result_'):
+            split = _split_result_column(series.tolist())
+            if split is None:
+                logger.debug(f"Keeping {col} as text, values do not round trip")
+                compact[col] = series
+                continue
+            status, percent, decimals = split
+            compact[col + STATUS_SUFFIX] = status
+            compact[col + PERCENT_SUFFIX] = percent
+            result_decimals[col] = decimals
+
+        elif pd.api.types.is_float_dtype(series):
+            compact[col] = _narrow_float(series)
+
+        else:
+            compact[col] = series
+
+    compact.attrs['source_columns'] = list(df.columns)
+    compact.attrs['source_dtypes'] = {col: str(dtype) for col, dtype in df.dtypes.items()}
+    compact.attrs['result_decimals'] = result_decimals
+    return compact
+
+def expand_table(compact):
+    """Convert a compact table back to the display format of process_table_data"""
+    source_columns = compact.attrs.get('source_columns', list(compact.columns))
+    source_dtypes = compact.attrs.get('source_dtypes', {})
+    result_decimals = compact.attrs.get('result_decimals', {})
+
+    df = pd.DataFrame(index=compact.index)
+    for col in source_columns:
+        if col in result_decimals:
+            statuses = compact[col + STATUS_SUFFIX].astype(object)
+            percents = compact[col + PERCENT_SUFFIX]
+            decimals = result_decimals[col]
+            series = pd.Series([_format_result(s, p, decimals) for s, p in zip(statuses, percents)],
+                               index=compact.index, dtype=object)
+        else:
+            series = compact[col]
+            if series.dtype == 'float32':
+                series = series.astype(str).astype('float64')
+
+        dtype = source_dtypes.get(col)
+        if dtype and str(series.dtype) != dtype:
+            series = series.astype(dtype)
+        df[col] = series
+
+    return df
+
+def table_memory_bytes(df):
+    """Deep memory footprint of a table in bytes"""
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,160 @@
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+import threading
+from flask import Response, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only when the brotli package is missing
+    brotli = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/csv', 'text/plain',
+    'application/json', 'application/javascript', 'text/javascript', 'image/svg+xml'
+}
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5              # per response; static assets use the maximum
+STATIC_BROTLI_QUALITY = 11
+FINGERPRINT_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def negotiate_encoding(encodings):
+    """Pick the best content encoding the client accepts among those on offer"""
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in encodings and accepted[encoding] > 0:
+            return encoding
+    return None
+
+def compress(data, encoding, static=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if static else GZIP_LEVEL, mtime=0)
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+class StaticAsset:
+    """A static file with its content fingerprint and pre-compressed variants"""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self.digest = hashlib.sha256(self.data).hexdigest()[:FINGERPRINT_LENGTH]
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = {}
+        if self.mimetype in COMPRESSIBLE_MIMETYPES and len(self.data) >= MIN_COMPRESS_SIZE:
+            for encoding in available_encodings():
+                compressed = compress(self.data, encoding, static=True)
+                if len(compressed) < len(self.data):
+                    self.variants[encoding] = compressed
+
+class StaticAssets:
+    """Fingerprints and pre-compresses everything under the static folder at startup"""
+
+    def __init__(self, static_folder, auto_reload=False):
+        self.static_folder = static_folder
+        self.auto_reload = auto_reload
+        self._assets = {}
+        self._lock = threading.Lock()
+        self.scan()
+
+    def scan(self):
+        assets = {}
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                assets[filename] = StaticAsset(path)
+        with self._lock:
+            self._assets = assets
+        logger.info(f"Fingerprinted {len(assets)} static assets")
+
+    def get(self, filename):
+        with self._lock:
+            asset = self._assets.get(filename)
+        if asset is not None and self.auto_reload:
+            try:
+                if os.path.getmtime(asset.path) != asset.mtime:
+                    asset = StaticAsset(asset.path)
+                    with self._lock:
+                        self._assets[filename] = asset
+            except OSError:
+                return None
+        return asset
+
+def init_compression(app):
+    """Compress dynamic responses and serve fingerprinted, pre-compressed static files.
+
+    HTML/JSON/CSV responses are gzip- or brotli-encoded on the way out.
+    url_for('static', ...) gains a ?v=<content hash> parameter; requests
+    carrying the current hash are cached as immutable, anything else is
+    revalidated by ETag.
+    """
+    assets = StaticAssets(app.static_folder, auto_reload=app.debug)
+    app.extensions['static_assets'] = assets
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            asset = assets.get(values['filename'])
+            if asset is not None:
+                values.setdefault('v', asset.digest)
+
+    def serve_static(filename):
+        asset = assets.get(filename)
+        if asset is None:
+            return send_from_directory(app.static_folder, filename)
+
+        encoding = negotiate_encoding(asset.variants)
+        response = Response(asset.variants[encoding] if encoding else asset.data, mimetype=asset.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        # ETags differ per encoding so caches never mix variants
+        response.set_etag(f"{asset.digest}-{encoding}" if encoding else asset.digest)
+        if request.args.get('v') == asset.digest:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    app.view_functions['static'] = serve_static
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.status_code in (204, 206)
+                or 'Content-Range' in response.headers
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        # Generator bodies (streamed exports) are left alone
+        if response.is_streamed and not response.direct_passthrough:
+            return response
+
+        encoding = negotiate_encoding(available_encodings())
+        if encoding is None:
+            return response
+
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return assets
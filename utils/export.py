@@ -0,0 +1,106 @@
+import io
+import re
+import zipfile
+import logging
+import importlib.util
+from utils.processing import process_table_data
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+EXCEL_FORMAT = "xlsx"
+ARCHIVE_FORMATS = {
+    # format: (entry extension, zip compression)
+    "csv": ("csv", zipfile.ZIP_DEFLATED),
+    "jsonl": ("jsonl", zipfile.ZIP_DEFLATED),
+    # Parquet pages are already compressed
+    "parquet": ("parquet", zipfile.ZIP_STORED),
+}
+EXPORT_FORMATS = [EXCEL_FORMAT] + list(ARCHIVE_FORMATS)
+
+def parquet_available():
+    """Parquet export needs pyarrow or fastparquet, neither of which is required"""
+    return any(importlib.util.find_spec(name) for name in ("pyarrow", "fastparquet"))
+
+class _StreamSink(io.RawIOBase):
+    """Write-only, non-seekable sink that hands back what was written so far.
+
+    zipfile falls back to data descriptors on unseekable output, which lets
+    each archive entry be flushed to the client as soon as it is complete.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _entry_name(filename, table_name, extension):
+    """Archive path for one table of one report"""
+    stem = re.sub(r'\.pdf$', '', filename, flags=re.IGNORECASE)
+    table_slug = table_name.replace(' ', '_')
+    return f"{stem}/{table_slug}.{extension}"
+
+def _write_entry(zf, name, df, fmt, compression):
+    """Serialize one processed table into an archive entry"""
+    if fmt == "parquet":
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        zf.writestr(name, buffer.getvalue(), compress_type=compression)
+        return
+
+    with zf.open(name, 'w') as entry:
+        text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+        if fmt == "csv":
+            df.to_csv(text, index=False)
+        else:
+            df.to_json(text, orient='records', lines=True)
+        text.flush()
+        text.detach()
+
+SKIPPED_ENTRY = "SKIPPED.txt"
+
+def iter_export_archive(reports, fmt, skipped=None):
+    """Yield a zip archive of per-table files chunk by chunk.
+
+    reports is an iterable of (filename, tables) pairs, typically a
+    generator that extracts each PDF on demand, so extraction and
+    streaming interleave and only one report is held at a time. skipped
+    is a list of (filename, reason) pairs that the generator fills as it
+    goes; when it is non-empty by the end, the archive lists them in
+    SKIPPED.txt.
+    """
+    extension, compression = ARCHIVE_FORMATS[fmt]
+    sink = _StreamSink()
+    entries = 0
+
+    with zipfile.ZipFile(sink, 'w', compression=compression) as zf:
+        for filename, tables in reports:
+            for table_name, table_data in tables.items():
+                if not table_data:
+                    continue
+                df = process_table_data(table_data, table_name)
+                if df.empty:
+                    continue
+                _write_entry(zf, _entry_name(filename, table_name, extension), df, fmt, compression)
+                entries += 1
+                yield sink.drain()
+
+        if skipped:
+            zf.writestr(SKIPPED_ENTRY, "".join(f"{filename}: {reason}\n" for filename, reason in skipped))
+            logger.warning(f"Archive lists {len(skipped)} skipped reports")
+
+    # Central directory
+    yield sink.drain()
+    logger.info(f"Streamed {fmt} archive with {entries} tables")
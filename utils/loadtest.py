@@ -0,0 +1,290 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.utils import secure_filename
+from utils.sandbox import rss_bytes
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MIX = "viewer=6,downloader=3,bulk=1"
+DEFAULT_FILES_PER_SESSION = 2
+FIXTURE_REPORTS = 8
+FIXTURE_ROWS_PER_PAGE = 60
+RSS_SAMPLE_INTERVAL = 0.5
+SESSION_STEPS = {
+    # Light page views plus one processed report
+    "viewer": ["index", "upload", "select", "choose", "process"],
+    # Viewer who also downloads the workbook for the selected report
+    "downloader": ["index", "upload", "select", "choose", "process", "download"],
+    # Uploads a batch and pulls the bulk workbook
+    "bulk": ["index", "upload", "select", "bulk_download"],
+}
+
+def parse_mix(mix):
+    """Parse "viewer=6,bulk=1" into session type weights"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SESSION_STEPS:
+            raise ValueError(f"Unknown session type: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class LoadRecorder:
+    """Thread-safe collection of per-route latencies and statuses"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+
+    def summary(self, elapsed):
+        routes = {}
+        with self._lock:
+            for route, values in self.latencies.items():
+                values = sorted(values)
+                statuses = dict(self.statuses[route])
+                routes[route] = {
+                    "requests": len(values),
+                    "throughput_rps": round(len(values) / elapsed, 3) if elapsed else 0.0,
+                    "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                    "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                    "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                    "max_ms": round(values[-1] * 1000, 1),
+                    "rejected_503": statuses.get(503, 0),
+                    "errors_5xx": sum(n for s, n in statuses.items() if s >= 500 and s != 503),
+                    "statuses": {str(s): n for s, n in sorted(statuses.items())},
+                }
+        total = sum(r["requests"] for r in routes.values())
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 3) if elapsed else 0.0,
+            "routes": routes,
+        }
+
+class RssSampler(threading.Thread):
+    """Samples RSS of the app process and its extraction workers over time"""
+
+    def __init__(self, worker_pids, interval=RSS_SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.worker_pids = worker_pids
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._start = time.monotonic()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            app_rss = rss_bytes(os.getpid()) or 0
+            workers_rss = sum(rss_bytes(pid) or 0 for pid in self.worker_pids())
+            self.samples.append({
+                "t": round(time.monotonic() - self._start, 2),
+                "app_mb": round(app_rss / (1024 * 1024), 1),
+                "workers_mb": round(workers_rss / (1024 * 1024), 1),
+            })
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def _timed_request(client, recorder, route, method, path, **kwargs):
+    """Issue one request through the app and record its latency by route"""
+    start = time.perf_counter()
+    response = getattr(client, method)(path, **kwargs)
+    try:
+        body = response.get_data()
+    finally:
+        response.close()
+    recorder.record(route, time.perf_counter() - start, response.status_code)
+    return response, body
+
+def load_corpus(directory):
+    """Read the fixture PDFs once so disk reads stay out of the measurements"""
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith('.pdf'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                corpus.append((name, f.read()))
+    return corpus
+
+def _fixture_rows(rng, limit, allowed=1.0):
+    """Harmonics 2-50 for one time limit with random per-phase measurements"""
+    rows = []
+    for harmonic in range(2, 51):
+        measured = [round(rng.random() * 1.3, 2) for _ in range(3)]
+        results = " ".join(f"{'Fail' if value > allowed else 'Pass'}({value / allowed * 100:.2f}%)"
+                           for value in measured)
+        rows.append(f"{harmonic} {limit} {allowed} {measured[0]} {measured[1]} {measured[2]} {results}")
+    return rows
+
+def fixture_corpus(count=FIXTURE_REPORTS, seed=0):
+    """Synthetic reports in the report layout, for runs without a stored corpus.
+
+    Alternating DAY and NIGHT reports on consecutive days of one feeder, so
+    bulk downloads exercise the weekly rollup too. Each table's 99% rows
+    run onto a second page, as in real reports.
+    """
+    from utils.processing import SUPPORTED_TABLES
+    from utils.warmup import WARM_UP_PAGES, _warm_up_pdf
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        day, period = i // 2 + 1, ("DAY", "NIGHT")[i % 2]
+        name = f"FIXTURE BLOCK 1 FEEDER 1 DAY {day} {period}"
+        pages = [[f"{name} TATA", WARM_UP_PAGES[0][1]]]
+        for table_name in SUPPORTED_TABLES:
+            rows = [table_name.upper()] + _fixture_rows(rng, 95) + _fixture_rows(rng, 99)
+            pages.append(rows[:FIXTURE_ROWS_PER_PAGE])
+            pages.append(rows[FIXTURE_ROWS_PER_PAGE:])
+        corpus.append((f"{name}.pdf", _warm_up_pdf(pages)))
+    return corpus
+
+def extraction_worker_pids():
+    """PIDs of this process's live children, i.e. the sandboxed extraction workers"""
+    return [child.pid for child in multiprocessing.active_children()]
+
+def run_session(app, session_type, corpus, files_per_session, recorder, rng):
+    """Drive one simulated user through the routes of a session type"""
+    client = app.test_client()
+    files = rng.sample(corpus, min(files_per_session, len(corpus)))
+    uploaded = [secure_filename(name) for name, _ in files]
+
+    for step in SESSION_STEPS[session_type]:
+        if step == "index":
+            _timed_request(client, recorder, "GET /", "get", "/")
+        elif step == "upload":
+            data = {'files': [(io.BytesIO(content), name) for name, content in files]}
+            _timed_request(client, recorder, "POST /", "post", "/",
+                           data=data, content_type='multipart/form-data')
+        elif step == "select":
+            _timed_request(client, recorder, "GET /select", "get", "/select")
+        elif step == "choose":
+            _timed_request(client, recorder, "POST /select", "post", "/select",
+                           data={'selected_file': rng.choice(uploaded)})
+        elif step == "process":
+            _timed_request(client, recorder, "GET /process", "get", "/process")
+        elif step == "download":
+            with client.session_transaction() as sess:
+                selected = sess.get('selected_file', uploaded[0])
+            _timed_request(client, recorder, "GET /download/<f>", "get", f"/download/{selected}")
+        elif step == "bulk_download":
+            _timed_request(client, recorder, "GET /bulk_download", "get", "/bulk_download")
+
+def run_load(app, corpus, sessions, concurrency, mix, files_per_session=DEFAULT_FILES_PER_SESSION,
+             seed=None, worker_pids=extraction_worker_pids):
+    """Run simulated sessions against the app and return the load report"""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    plan = [rng.choices(names, weights)[0] for _ in range(sessions)]
+
+    recorder = LoadRecorder()
+    sampler = RssSampler(worker_pids)
+    sampler.start()
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run_session, app, session_type, corpus, files_per_session,
+                            recorder, random.Random(rng.random()))
+            for session_type in plan
+        ]
+        failures = 0
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                failures += 1
+                logger.error(f"Session failed: {str(e)}")
+
+    elapsed = time.monotonic() - start
+    sampler.stop()
+
+    report = recorder.summary(elapsed)
+    report.update({
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "mix": mix,
+        "session_failures": failures,
+        "rss": sampler.samples,
+        "peak_app_mb": max((s["app_mb"] for s in sampler.samples), default=0.0),
+        "peak_workers_mb": max((s["workers_mb"] for s in sampler.samples), default=0.0),
+    })
+    return report
+
+def format_report(report):
+    """Render the per-route table printed at the end of a run"""
+    lines = [
+        f"{report['requests']} requests in {report['elapsed_seconds']}s "
+        f"({report['throughput_rps']} req/s), concurrency {report['concurrency']}",
+        f"{'route':<22}{'reqs':>6}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'503':>6}{'5xx':>6}",
+    ]
+    for route, stats in sorted(report["routes"].items()):
+        lines.append(
+            f"{route:<22}{stats['requests']:>6}{stats['throughput_rps']:>8}{stats['p50_ms']:>9}"
+            f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['rejected_503']:>6}{stats['errors_5xx']:>6}"
+        )
+    lines.append(f"peak RSS: app {report['peak_app_mb']} MB, extraction workers {report['peak_workers_mb']} MB")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive the app's routes with simulated sessions")
+    parser.add_argument("corpus", nargs="?",
+                        help="Directory of fixture PDF reports (default: generate synthetic reports)")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Session type weights (default {DEFAULT_MIX})")
+    parser.add_argument("--files-per-session", type=int, default=DEFAULT_FILES_PER_SESSION)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write the full JSON report here for release comparisons")
+    args = parser.parse_args(argv)
+
+    if args.corpus is None:
+        corpus = fixture_corpus()
+        logger.warning(f"No corpus given, using {len(corpus)} generated fixture reports")
+    else:
+        corpus = load_corpus(args.corpus)
+        if not corpus:
+            parser.error(f"No PDF files found in {args.corpus}")
+
+    from app import create_app
+    app = create_app()
+
+    report = run_load(app, corpus, args.sessions, args.concurrency, parse_mix(args.mix),
+                      args.files_per_session, args.seed)
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["session_failures"] else 0
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -46,6 +46,15 @@ SECTION_BOUNDARIES = {
     ]
 }
 
+# Sheet holding the weekly DAY/NIGHT rollup in bulk downloads
+ROLLUP_SHEET_NAME = "Weekly_Rollup"
+
+# Report naming: "DAY 3 NIGHT", "Day_3_Day" (after secure_filename) or
+# "DAY3" for daily reports, "7 days" for the meter's weekly report. DAY must
+# be a word of its own, so "TODAY 3" or "HOLIDAY 2 NIGHT" do not match.
+DAY_PERIOD_PATTERN = re.compile(r'(?<![A-Z])DAY[\s_-]*(\d+)(?:[\s_-]*(DAY|NIGHT)(?![A-Z]))?')
+WEEKLY_REPORT_PATTERN = re.compile(r'(?<![\dA-Z])7[\s_-]*DAYS(?![A-Z])')
+
 # All supported table names
 SUPPORTED_TABLES = [
     "Harmonic Voltage Full Time Range",
@@ -89,6 +98,30 @@ TEXT_EXTRACTION_PATTERNS = [
     )
 ]
 
+# First-page report header: start/end time, GMT offset and report version
+REPORT_INFO_PATTERN = re.compile(
+    r"Start time:\s*(\d{2}-\d{2}-\d{4}\s*\d{2}:\d{2}:\d{2}\s*[AP]M)\s*"
+    r"End time:\s*(\d{2}-\d{2}-\d{4}\s*\d{2}:\d{2}:\d{2}\s*[AP]M)\s*"
+    r"GMT:\s*([+-]\d{2}:\d{2})\s*"
+    r"Report Version:\s*([\d.]+)"
+)
+
+# pdfplumber table settings used unless a profile overrides them
+DEFAULT_TABLE_SETTINGS = {}
+
+# Table settings tried when learning a layout whose ruled tables the
+# defaults only partly recover: columns aligned by whitespace instead
+ALTERNATE_TABLE_SETTINGS = [
+    {"vertical_strategy": "text", "horizontal_strategy": "text"},
+]
+
+# Learned extraction profiles keyed by layout fingerprint
+# (report version, PDF producer, first page size). Each profile records the
+# strategy that reproduces the full pass for that layout ("structured",
+# "text" or "dual"), the table settings to use and the time limits each
+# table lists.
+EXTRACTION_PROFILES = {}
+
 def extract_metadata(pdf_file, filename):
     """Extract metadata from PDF file"""
     name = filename if isinstance(filename, str) else filename.name
@@ -106,14 +139,7 @@ def extract_metadata(pdf_file, filename):
         with pdfplumber.open(pdf_file if isinstance(pdf_file, str) else pdf_file) as pdf:
             text0 = pdf.pages[0].extract_text() or ""
         
-        time_pattern = re.compile(
-            r"Start time:\s*(\d{2}-\d{2}-\d{4}\s*\d{2}:\d{2}:\d{2}\s*[AP]M)\s*"
-            r"End time:\s*(\d{2}-\d{2}-\d{4}\s*\d{2}:\d{2}:\d{2}\s*[AP]M)\s*"
-            r"GMT:\s*([+-]\d{2}:\d{2})\s*"
-            r"Report Version:\s*([\d.]+)"
-        )
-        
-        match = time_pattern.search(text0)
+        match = REPORT_INFO_PATTERN.search(text0)
         if match:
             report_info = {
                 "start_time": match.group(1),
@@ -133,6 +159,9 @@ def extract_metadata(pdf_file, filename):
 
         return component_text, block, feeder, company, report_info
 
+    except MemoryError:
+        # Let sandboxed workers report a memory limit hit instead of empty tables
+        raise
     except Exception as e:
         logger.error(f"Error extracting metadata: {str(e)}")
         return "Not found", "Error", "Error", "Error", report_info
@@ -222,13 +251,18 @@ def _extract_text_data(text, tables, active_table):
     """Helper function to extract text-based data"""
     text_data = extract_table_data_from_text(text)
     if text_data:
-        existing_harmonics = {int(row[0]) for row in tables[active_table] if row and str(row[0]).isdigit()}
+        # A row is a duplicate only for the same harmonic and time limit;
+        # tables list harmonics 2-50 once per time limit
+        existing_rows = {
+            (int(row[0]), str(row[1]).strip())
+            for row in tables[active_table] if row and str(row[0]).isdigit()
+        }
         for new_row in text_data:
             try:
                 harmonic_value = int(new_row[0])
                 
                 # ADDITIONAL FILTER: Ensure we only add valid harmonics (2-50)
-                if 2 <= harmonic_value <= 50 and harmonic_value not in existing_harmonics:
+                if 2 <= harmonic_value <= 50 and (harmonic_value, str(new_row[1]).strip()) not in existing_rows:
                     tables[active_table].append(new_row)
             except (ValueError, IndexError):
                 continue
@@ -244,64 +278,218 @@ def _check_boundary_hit(upper_text, active_table):
     
     return any(boundary in upper_text for boundary in boundaries)
 
-def extract_tables_from_pdf(file):
-    """Extract all harmonic tables from PDF starting from page 2"""
+def _extract_page_data(page_tables, text, tables, active_table, strategy, stats):
+    """Run the strategies enabled for this pass and count the rows each adds"""
+    if strategy != "text":
+        before = len(tables[active_table])
+        _extract_structured_data(page_tables, tables, active_table)
+        stats["structured"] += len(tables[active_table]) - before
+
+    if strategy != "structured":
+        before = len(tables[active_table])
+        _extract_text_data(text, tables, active_table)
+        stats["text"] += len(tables[active_table]) - before
+
+def _run_extraction(pdf, strategy="dual", table_settings=None):
+    """Walk pages 2+ and collect table rows using the given strategy"""
     tables = {table_name: [] for table_name in SUPPORTED_TABLES}
-    
+    stats = {"structured": 0, "text": 0}
+    active_table = None
+
+    # Skip first page as requested
+    for page_num, page in enumerate(pdf.pages):
+        if page_num == 0:  # Skip first page
+            continue
+
+        page_text = page.extract_text() or ""
+        upper_text = page_text.upper()
+
+        # The text-only path never looks at pdfplumber tables, so skip finding them
+        if strategy == "text":
+            page_tables = []
+        else:
+            page_tables = page.extract_tables(table_settings or DEFAULT_TABLE_SETTINGS)
+
+        # Check for table headers
+        for table_name in tables:
+            table_name_upper = table_name.upper()
+            if table_name_upper in upper_text:
+                start_idx = upper_text.find(table_name_upper)
+                end_idx = len(page_text)
+
+                # Find section boundaries
+                for boundary in SECTION_BOUNDARIES.get(table_name_upper, []):
+                    boundary_idx = upper_text.find(boundary, start_idx + len(table_name))
+                    if boundary_idx != -1:
+                        end_idx = min(end_idx, boundary_idx)
+
+                section_text = page_text[start_idx:end_idx]
+                active_table = table_name
+
+                # Extract structured tables, then from text as fallback
+                _extract_page_data(page_tables, section_text, tables, active_table, strategy, stats)
+                continue
+
+        # Continue extracting for active table
+        if active_table and not _check_boundary_hit(upper_text, active_table):
+            _extract_page_data(page_tables, page_text, tables, active_table, strategy, stats)
+        else:
+            # Only reset active_table if we actually hit a real boundary, not "HARMONIC 5:"
+            if active_table and _check_boundary_hit(upper_text, active_table):
+                # Special case: Don't stop for "HARMONIC 5:" when processing Harmonic Current Daily
+                if active_table == "Harmonic Current Daily" and "HARMONIC 5:" in upper_text:
+                    # Continue processing this page for the current table
+                    _extract_page_data(page_tables, page_text, tables, active_table, strategy, stats)
+                else:
+                    active_table = None
+
+    return tables, stats
+
+def _layout_fingerprint(pdf, report_version=None):
+    """Identify the report layout by version, producer and page geometry"""
+    if not report_version or report_version == "Not found":
+        text0 = (pdf.pages[0].extract_text() or "") if pdf.pages else ""
+        match = REPORT_INFO_PATTERN.search(text0)
+        report_version = match.group(4) if match else "Not found"
+
+    producer = str((pdf.metadata or {}).get("Producer", ""))
+    first_page = pdf.pages[0] if pdf.pages else None
+    size = (round(first_page.width), round(first_page.height)) if first_page else (0, 0)
+    return (report_version, producer, size)
+
+def _harmonics_by_limit(rows):
+    """Map each time percent limit in a table to the harmonics found for it"""
+    covered = {}
+    for row in rows:
+        try:
+            covered.setdefault(str(row[1]).strip(), set()).add(int(row[0]))
+        except (ValueError, TypeError, IndexError):
+            continue
+    return covered
+
+def _row_keys(tables):
+    return {
+        (table_name, limit, harmonic)
+        for table_name, rows in tables.items()
+        for limit, harmonics in _harmonics_by_limit(rows).items()
+        for harmonic in harmonics
+    }
+
+def _learn_profile(pdf, tables, stats, table_settings):
+    """Build an extraction profile from the outcome of a full dual pass.
+
+    A single strategy is only chosen when its rows alone are the dual
+    pass's rows; when the default table settings only recover some rows,
+    the alternate settings get a structured-only try.
+    """
+    if stats["text"] == 0 and stats["structured"] > 0:
+        strategy = "structured"
+    elif stats["structured"] == 0 and stats["text"] > 0:
+        strategy = "text"
+    else:
+        strategy = "dual"
+        expected = _row_keys(tables)
+        for settings in ALTERNATE_TABLE_SETTINGS:
+            candidate, _ = _run_extraction(pdf, "structured", settings)
+            if _row_keys(candidate) == expected:
+                strategy, table_settings = "structured", settings
+                break
+
+    return {
+        "strategy": strategy,
+        "table_settings": dict(table_settings),
+        "time_limits": {
+            table_name: sorted(_harmonics_by_limit(rows))
+            for table_name, rows in tables.items() if rows
+        },
+    }
+
+def _is_short(tables, profile):
+    """Check whether a fast pass misses any of harmonics 2-50 for a table and time limit.
+
+    Harmonics the reference pass also lacked for this layout are not
+    counted as missing.
+    """
+    for table_name, time_limits in profile["time_limits"].items():
+        covered = _harmonics_by_limit(tables.get(table_name, []))
+        known_gaps = profile.get("missing_harmonics", {}).get(table_name, {})
+        for limit in time_limits:
+            expected = EXPECTED_HARMONICS - set(known_gaps.get(limit, ()))
+            if not expected <= covered.get(limit, set()):
+                return True
+    return False
+
+def _with_known_gaps(profile, tables):
+    """Return the profile with the harmonics these tables lack recorded as known gaps"""
+    missing = {table_name: dict(gaps) for table_name, gaps in profile.get("missing_harmonics", {}).items()}
+    for table_name, time_limits in profile["time_limits"].items():
+        covered = _harmonics_by_limit(tables.get(table_name, []))
+        for limit in time_limits:
+            gaps = EXPECTED_HARMONICS - covered.get(limit, set())
+            if gaps:
+                table_gaps = missing.setdefault(table_name, {})
+                table_gaps[limit] = sorted(gaps | set(table_gaps.get(limit, ())))
+    return {**profile, "missing_harmonics": missing}
+
+def get_extraction_profiles():
+    """Return a copy of the learned extraction profiles keyed by fingerprint"""
+    return {fingerprint: dict(profile) for fingerprint, profile in EXTRACTION_PROFILES.items()}
+
+def merge_extraction_profiles(profiles):
+    """Adopt profiles learned elsewhere, e.g. in another extraction worker"""
+    EXTRACTION_PROFILES.update(profiles)
+
+def clear_extraction_profiles():
+    """Forget all learned extraction profiles"""
+    EXTRACTION_PROFILES.clear()
+
+def extract_tables_from_pdf(file, report_version=None, use_profiles=True):
+    """Extract all harmonic tables from PDF starting from page 2.
+
+    Reports whose layout already has a learned profile take the single
+    strategy that worked for that layout; the full structured + text pass
+    only runs for new layouts or when the fast path comes up short.
+    """
+    tables = {table_name: [] for table_name in SUPPORTED_TABLES}
+
     try:
         with pdfplumber.open(file if isinstance(file, str) else file) as pdf:
-            active_table = None
-            
-            # Skip first page as requested
-            for page_num, page in enumerate(pdf.pages):
-                if page_num == 0:  # Skip first page
-                    continue
-                    
-                page_text = page.extract_text() or ""
-                upper_text = page_text.upper()
-                page_tables = page.extract_tables()
-                
-                # Check for table headers
-                for table_name in tables:
-                    table_name_upper = table_name.upper()
-                    if table_name_upper in upper_text:
-                        start_idx = upper_text.find(table_name_upper)
-                        end_idx = len(page_text)
-                        
-                        # Find section boundaries
-                        for boundary in SECTION_BOUNDARIES.get(table_name_upper, []):
-                            boundary_idx = upper_text.find(boundary, start_idx + len(table_name))
-                            if boundary_idx != -1:
-                                end_idx = min(end_idx, boundary_idx)
-                        
-                        section_text = page_text[start_idx:end_idx]
-                        active_table = table_name
-                        
-                        # Extract structured tables
-                        _extract_structured_data(page_tables, tables, active_table)
-                        
-                        # Extract from text as fallback
-                        _extract_text_data(section_text, tables, active_table)
-                        continue
-                
-                # Continue extracting for active table
-                if active_table and not _check_boundary_hit(upper_text, active_table):
-                    _extract_structured_data(page_tables, tables, active_table)
-                    _extract_text_data(page_text, tables, active_table)
-                else:
-                    # Only reset active_table if we actually hit a real boundary, not "HARMONIC 5:"
-                    if active_table and _check_boundary_hit(upper_text, active_table):
-                        # Special case: Don't stop for "HARMONIC 5:" when processing Harmonic Current Daily
-                        if active_table == "Harmonic Current Daily" and "HARMONIC 5:" in upper_text:
-                            # Continue processing this page for the current table
-                            _extract_structured_data(page_tables, tables, active_table)
-                            _extract_text_data(page_text, tables, active_table)
-                        else:
-                            active_table = None
+            fingerprint = _layout_fingerprint(pdf, report_version) if use_profiles else None
+            profile = EXTRACTION_PROFILES.get(fingerprint) if use_profiles else None
+
+            fast_tables = None
+            if profile and profile["strategy"] != "dual":
+                fast_tables, _ = _run_extraction(pdf, profile["strategy"], profile["table_settings"])
+                if not _is_short(fast_tables, profile):
+                    logger.debug(f"Used {profile['strategy']} profile for layout {fingerprint}")
+                    return fast_tables
+                logger.info(f"Profile for layout {fingerprint} came up short, running full extraction")
+
+            # The reference pass always uses the default settings, whatever the profile holds
+            tables, stats = _run_extraction(pdf, "dual", DEFAULT_TABLE_SETTINGS)
 
+            if use_profiles and any(tables.values()):
+                if profile is None:
+                    EXTRACTION_PROFILES[fingerprint] = _learn_profile(pdf, tables, stats, DEFAULT_TABLE_SETTINGS)
+                    logger.info(f"Learned {EXTRACTION_PROFILES[fingerprint]['strategy']} profile "
+                                f"for layout {fingerprint}")
+                elif fast_tables is not None and _row_keys(tables) <= _row_keys(fast_tables):
+                    # The report itself lacks these rows; stop falling back for them
+                    EXTRACTION_PROFILES[fingerprint] = _with_known_gaps(profile, fast_tables)
+                    logger.info(f"Recorded missing harmonics for layout {fingerprint}")
+                elif fast_tables is not None:
+                    learned = _learn_profile(pdf, tables, stats, DEFAULT_TABLE_SETTINGS)
+                    if (learned["strategy"], learned["table_settings"]) != (profile["strategy"],
+                                                                            profile["table_settings"]):
+                        EXTRACTION_PROFILES[fingerprint] = learned
+                        logger.info(f"Relearned {learned['strategy']} profile for layout {fingerprint}")
+
+    except MemoryError:
+        # Let sandboxed workers report a memory limit hit instead of empty tables
+        raise
     except Exception as e:
         logger.error(f"Error processing PDF: {str(e)}")
-    
+
     return tables
 
 def process_table_data(table_data, table_name=None):
@@ -444,22 +632,27 @@ def highlight_fails_in_excel(df, ws, start_row=1):
             except:
                 continue
 
+def is_weekly_report(filename):
+    """Check for the meter's own 7-day report, which needs no rollup"""
+    return WEEKLY_REPORT_PATTERN.search(filename.upper()) is not None
+
+def parse_day_period(filename):
+    """Return (day number, "DAY"/"NIGHT") for daily report names, else (None, None)"""
+    if is_weekly_report(filename):
+        return None, None
+    match = DAY_PERIOD_PATTERN.search(filename.upper())
+    if not match:
+        return None, None
+    return int(match.group(1)), match.group(2) or "DAY"
+
 def parse_filename_for_sheet_name(filename):
     """Parse filename to extract day number and time period for concise sheet naming"""
-    filename_upper = filename.upper()
-    
-    if "7" in filename_upper and "DAY" in filename_upper:
+    if is_weekly_report(filename):
         return "7Days"
     
-    day_pattern = re.search(r'DAY\s*(\d+)\s*(DAY|NIGHT)', filename_upper)
-    if day_pattern:
-        day_num = day_pattern.group(1)
-        period = "D" if "DAY" in day_pattern.group(2) else "N"
-        return f"{day_num}{period}"
-    
-    day_only_pattern = re.search(r'DAY\s*(\d+)', filename_upper)
-    if day_only_pattern:
-        return f"{day_only_pattern.group(1)}D"
+    day, period = parse_day_period(filename)
+    if day is not None:
+        return f"{day}{period[0]}"
     
     clean_name = re.sub(r'[^\w]', '', filename.replace('.pdf', ''))
     return clean_name[:4]
@@ -512,12 +705,22 @@ def create_excel_download(tables_data, filename):
     output.seek(0)
     return output.getvalue()
 
-def create_bulk_excel_download(all_files_data):
+def create_bulk_excel_download(all_files_data, rollup_summary=None):
     """Create Excel file with all PDFs using concise sheet naming and highlighting"""
     output = BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
         sheet_file_map = {}
         
+        # Weekly DAY/NIGHT rollup goes first when there are day reports
+        if rollup_summary is not None and not rollup_summary.empty:
+            rollup_summary.to_excel(writer, sheet_name=ROLLUP_SHEET_NAME, index=False)
+            worksheet = writer.book[ROLLUP_SHEET_NAME]
+            fail_fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
+            compliant_col = list(rollup_summary.columns).index("Compliant") + 1
+            for r_idx, compliant in enumerate(rollup_summary["Compliant"], 2):
+                if not compliant:
+                    worksheet.cell(row=r_idx, column=compliant_col).fill = fail_fill
+        
         for file_name, tables_data in all_files_data.items():
             file_prefix = parse_filename_for_sheet_name(file_name)
             
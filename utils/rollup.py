@@ -0,0 +1,162 @@
+import re
+import numpy as np
+import pandas as pd
+import logging
+from utils.processing import process_table_data, parse_day_period, DAY_PERIOD_PATTERN
+from utils.compact import compact_table
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+DAILY_TABLES = ["Harmonic Voltage Daily", "Harmonic Current Daily"]
+UNKNOWN_METADATA = {"Not found", "Error", "", None}
+LABEL_COLUMNS = ["Block", "Feeder", "Table", "Phase", "Period", "Report"]
+BLOCK_PATTERN = re.compile(r'(?<![A-Z])BLOCK[\s_-]*(\d{1,3})(?!\d)')
+FEEDER_PATTERN = re.compile(r'(?<![A-Z])(?:FEEDER|BAY)[\s_-]*(\d{1,3})(?!\d)')
+SUMMARY_COLUMNS = [
+    "Block", "Feeder", "Table", "Harmonic", "Time Limit (%)", "Phase",
+    "Allowed (%)", "Days", "Reports", "Max (%)", "P95 (%)", "P99 (%)",
+    "Reports Exceeded", "Compliant"
+]
+
+def report_group(report):
+    """(block, feeder) a report rolls up under.
+
+    Uses the values from extract_metadata when both were found. Otherwise
+    they are read from the filename (which secure_filename has joined with
+    underscores), and failing that the filename minus its day/period part
+    becomes the feeder, so reports from different sites never merge.
+    Returns None when nothing identifies the site.
+    """
+    block, feeder = report.get("block"), report.get("feeder")
+    if block not in UNKNOWN_METADATA and feeder not in UNKNOWN_METADATA:
+        return block, feeder
+
+    stem = report["filename"].rsplit('.', 1)[0].upper()
+    block_match = BLOCK_PATTERN.search(stem)
+    feeder_match = FEEDER_PATTERN.search(stem)
+    if block_match and feeder_match:
+        return block_match.group(1), feeder_match.group(1)
+
+    site = re.sub(r'[\s_-]+', ' ', DAY_PERIOD_PATTERN.sub(' ', stem)).strip()
+    if not site:
+        return None
+    return "", site
+
+def build_daily_frame(reports):
+    """Stack the Daily tables of every day report into one long frame.
+
+    Each report is a dict with filename, block, feeder and the raw tables
+    returned by extract_tables_from_pdf. The result has one row per
+    report, table, harmonic, time limit and phase, held in the compact
+    schema (uint8 keys, float32 values, categorical labels) since a week
+    of reports stays in memory at once.
+    """
+    frames = []
+    for report in reports:
+        day, period = parse_day_period(report["filename"])
+        if day is None:
+            logger.debug(f"Skipping {report['filename']} for rollup, no day index")
+            continue
+        group = report_group(report)
+        if group is None:
+            logger.warning(f"Skipping {report['filename']} for rollup, no block/feeder to group by")
+            continue
+
+        for table_name in DAILY_TABLES:
+            table_data = report["tables"].get(table_name)
+            if not table_data:
+                continue
+            df = process_table_data(table_data, table_name)
+            if df.empty:
+                continue
+            df = compact_table(df)
+
+            measured_cols = [col for col in df.columns if col.startswith('Measured_')]
+            long_df = df.melt(
+                id_vars=["Harmonic", "Time Percent Limit[%]", "Reg Max[%]"],
+                value_vars=measured_cols, var_name="Phase", value_name="Measured"
+            )
+            long_df["Phase"] = long_df["Phase"].str.split('_').str[-1]
+            long_df["Table"] = table_name
+            long_df["Block"], long_df["Feeder"] = group
+            long_df["Day"] = day
+            long_df["Period"] = period
+            long_df["Report"] = report["filename"]
+            frames.append(long_df)
+
+    if not frames:
+        return pd.DataFrame()
+    daily = pd.concat(frames, ignore_index=True)
+    # Compare limits and measurements at the same precision
+    daily[["Reg Max[%]", "Measured"]] = daily[["Reg Max[%]", "Measured"]].astype('float32')
+    for col in LABEL_COLUMNS:
+        daily[col] = daily[col].astype('category')
+    return daily
+
+def _widen(series):
+    """float32 back to the float64 value it was narrowed from"""
+    return series.astype(str).astype('float64')
+
+def weekly_rollup(reports):
+    """Merge per-day DAY/NIGHT Daily tables into weekly per-harmonic compliance.
+
+    For every feeder/block, table, harmonic, time limit and phase the
+    summary holds the weekly maximum, the 95th and 99th percentile of the
+    per-report values and whether the percentile matching the row's time
+    limit stays within the regulation limit.
+    """
+    daily = build_daily_frame(reports)
+    if daily.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    daily["Exceeded"] = daily["Measured"] > daily["Reg Max[%]"]
+    keys = ["Block", "Feeder", "Table", "Harmonic", "Time Percent Limit[%]", "Phase"]
+    grouped = daily.groupby(keys, sort=True, observed=True)
+
+    summary = grouped.agg(
+        **{
+            "Allowed (%)": ("Reg Max[%]", "max"),
+            "Days": ("Day", "nunique"),
+            "Reports": ("Report", "nunique"),
+            "Max (%)": ("Measured", "max"),
+            "Reports Exceeded": ("Exceeded", "sum"),
+        }
+    )
+    percentiles = grouped["Measured"].quantile([0.95, 0.99]).unstack()
+    summary["P95 (%)"] = percentiles[0.95]
+    summary["P99 (%)"] = percentiles[0.99]
+    summary = summary.reset_index().rename(columns={"Time Percent Limit[%]": "Time Limit (%)"})
+
+    # Judge each row on the percentile its time limit refers to
+    governing = np.where(summary["Time Limit (%)"] >= 99, summary["P99 (%)"], summary["P95 (%)"])
+    summary["Compliant"] = governing <= summary["Allowed (%)"]
+
+    summary["Harmonic"] = summary["Harmonic"].astype(int)
+    summary["Time Limit (%)"] = summary["Time Limit (%)"].astype(int)
+    summary["Reports Exceeded"] = summary["Reports Exceeded"].astype(int)
+    for col in LABEL_COLUMNS:
+        if col in summary:
+            summary[col] = summary[col].astype(str)
+    summary["Allowed (%)"] = _widen(summary["Allowed (%)"])
+    for col in ["Max (%)", "P95 (%)", "P99 (%)"]:
+        summary[col] = _widen(summary[col]).round(3)
+
+    logger.info(f"Rolled up {daily['Report'].nunique()} reports into {len(summary)} summary rows")
+    return summary[SUMMARY_COLUMNS]
+
+def rollup_to_response(summary):
+    """Shape a rollup summary for the JSON API, grouped by feeder/block"""
+    groups = []
+    for (block, feeder), group_df in summary.groupby(["Block", "Feeder"], sort=True):
+        failing = group_df[~group_df["Compliant"]]
+        groups.append({
+            "block": block,
+            "feeder": feeder,
+            "days": int(group_df["Days"].max()),
+            "reports": int(group_df["Reports"].max()),
+            "non_compliant": int(len(failing)),
+            "rows": group_df.drop(columns=["Block", "Feeder"]).to_dict('records'),
+        })
+    return {"groups": groups}
@@ -0,0 +1,357 @@
+import io
+import os
+import sys
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+import multiprocessing.forkserver
+
+try:
+    import resource
+except ImportError:  # Windows: only the parent-side RSS watchdog (psutil) applies
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # Optional: RSS is read from /proc where psutil is missing
+    psutil = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_JOBS = 50
+DEFAULT_MEMORY_LIMIT_MB = 1024
+DEFAULT_TIMEOUT = 120.0
+WATCHDOG_INTERVAL = 0.2
+WORKER_PRELOAD = ["utils.processing"]
+
+class ExtractionLimitError(Exception):
+    """Structured failure of a sandboxed extraction job.
+
+    kind is one of "timeout", "memory", "crashed" or "failed".
+    """
+
+    def __init__(self, kind, message):
+        super().__init__(f"Extraction {kind}: {message}")
+        self.kind = kind
+        self.message = message
+
+    def to_dict(self):
+        return {"error": self.kind, "message": self.message}
+
+def _read_proc_kb(pid, field):
+    """Read a VmSize/VmRSS style field from /proc, or None where unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+def rss_bytes(pid):
+    """Resident set size of a process in bytes, or None where it cannot be read"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except (psutil.Error, OSError):
+            return None
+    return _read_proc_kb(pid, "VmRSS")
+
+def _rlimit_enforced():
+    """RLIMIT_AS is honoured on Linux only; macOS accepts it but does not enforce it"""
+    return resource is not None and sys.platform.startswith("linux")
+
+def _apply_memory_limit(memory_limit):
+    """Cap address space at what the imports already use plus the job budget"""
+    if not _rlimit_enforced() or not memory_limit:
+        return
+    baseline = _read_proc_kb("self", "VmSize") or 0
+    limit = baseline + memory_limit
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not set RLIMIT_AS in extraction worker: {str(e)}")
+
+def _worker_main(conn, memory_limit):
+    """Subprocess loop: receive (job, kwargs, path), plus the PDF bytes when
+    path is None, and send (status, result)"""
+    from utils.processing import (extract_tables_from_pdf, extract_metadata,
+                                  get_extraction_profiles, merge_extraction_profiles)
+
+    _apply_memory_limit(memory_limit)
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        job, kwargs, path = message
+        try:
+            source = path if path is not None else io.BytesIO(conn.recv_bytes())
+            if job in ("tables", "engine"):
+                # Profiles live in the parent so they survive worker recycling
+                merge_extraction_profiles(kwargs.pop("profiles", {}))
+            if job == "tables":
+                result = (extract_tables_from_pdf(source, **kwargs), get_extraction_profiles())
+            elif job == "metadata":
+                result = extract_metadata(source, **kwargs)
+            elif job == "engine":
+                engine = kwargs.pop("engine")
+                result = (engine(source, **kwargs), get_extraction_profiles())
+            else:
+                raise ValueError(f"Unknown job: {job}")
+            del source
+            conn.send(("ok", result))
+        except MemoryError:
+            # The heap may be fragmented past saving; report and exit so the
+            # pool replaces this worker
+            conn.send(("memory", "job exceeded the worker memory limit"))
+            break
+        except Exception as e:
+            conn.send(("failed", str(e)))
+
+def _worker_context():
+    """forkserver where available, so workers fork from a server that has
+    already imported the extraction stack; spawn elsewhere"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(WORKER_PRELOAD)
+        return context
+    return multiprocessing.get_context("spawn")
+
+class _InheritedForkServer(multiprocessing.forkserver.ForkServer):
+    """Fork server started before a pre-fork web server forked its workers.
+
+    The workers share it but are not its parent, so ensure_running() cannot
+    waitpid() it; liveness is checked with signal 0 instead, and a new
+    server is only launched once the inherited one is gone.
+    """
+
+    def ensure_running(self):
+        with self._lock:
+            pid = self._forkserver_pid
+            if pid is not None:
+                try:
+                    os.kill(pid, 0)
+                    return
+                except OSError:
+                    os.close(self._forkserver_alive_fd)
+                    self._forkserver_address = None
+                    self._forkserver_alive_fd = None
+                    self._forkserver_pid = None
+        super().ensure_running()
+
+def _adopt_forkserver():
+    server = multiprocessing.forkserver._forkserver
+    if server._forkserver_pid is not None:
+        server.__class__ = _InheritedForkServer
+
+def start_forkserver():
+    """Start the extraction fork server now, in this process, and let
+    processes forked from here use it; returns its pid, or None where the
+    forkserver start method is unavailable"""
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return None
+    _worker_context()
+    multiprocessing.forkserver.ensure_running()
+    if not getattr(start_forkserver, "registered", False):
+        os.register_at_fork(after_in_child=_adopt_forkserver)
+        start_forkserver.registered = True
+    return forkserver_pid()
+
+def forkserver_pid():
+    """Pid of the running fork server, or None"""
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.forkserver._forkserver._forkserver_pid
+
+class _Worker:
+    def __init__(self, context, memory_limit):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit),
+            name="extraction-worker", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+
+class ExtractionPool:
+    """Reusable extraction subprocesses with per-job memory and wall-time limits.
+
+    Each job runs in a worker process. The parent kills a worker whose RSS
+    passes memory_limit_mb or whose job runs past timeout; RSS comes from
+    psutil, or /proc where psutil is not installed. On Linux, workers also
+    cap RLIMIT_AS at their post-import address space plus the same
+    headroom so runaway allocations fail fast.
+    A worker is replaced after max_jobs jobs, after any limit hit and
+    whenever it dies. Limit hits raise ExtractionLimitError. Extraction
+    profiles learned in any worker are collected here and sent along with
+    every table and engine job, so all workers share them.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_jobs=DEFAULT_MAX_JOBS,
+                 memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, timeout=DEFAULT_TIMEOUT):
+        self.size = workers
+        self.max_jobs = max_jobs
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.timeout = timeout
+        self._context = _worker_context()
+        self._idle = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._counts = {"jobs": 0, "timeout": 0, "memory": 0, "crashed": 0, "failed": 0, "recycled": 0}
+        self._counts_lock = threading.Lock()
+        self._profiles = {}
+        self._profiles_lock = threading.Lock()
+        self._workers = set()
+
+    def _spawn(self):
+        worker = _Worker(self._context, self.memory_limit)
+        self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker, kill=False):
+        self._workers.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def start(self):
+        """Start the worker processes; called lazily on first use"""
+        with self._start_lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+            self._started = True
+            if self.memory_limit and not _rlimit_enforced() and rss_bytes(os.getpid()) is None:
+                logger.warning("No memory limit can be enforced on extraction workers: "
+                               "install psutil to enable the RSS watchdog")
+            logger.info(f"Started {self.size} extraction workers")
+
+    def shutdown(self):
+        with self._start_lock:
+            while not self._idle.empty():
+                self._retire(self._idle.get_nowait())
+            self._started = False
+
+    def _count(self, key):
+        with self._counts_lock:
+            self._counts[key] += 1
+
+    def stats(self):
+        with self._counts_lock:
+            return dict(self._counts, workers=self.size, idle=self._idle.qsize())
+
+    def rss_mb(self):
+        """Resident memory of the fork server and of each live worker, in MB"""
+        def mb(pid):
+            rss = rss_bytes(pid) if pid else None
+            return round(rss / (1024 * 1024), 1) if rss else None
+        return {
+            "forkserver": mb(forkserver_pid()),
+            "workers": [mb(worker.process.pid) for worker in list(self._workers)],
+        }
+
+    def _wait_for_result(self, worker):
+        """Poll the worker until it answers, watching RSS and wall time"""
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        while not worker.conn.poll(WATCHDOG_INTERVAL):
+            if not worker.process.is_alive():
+                raise ExtractionLimitError("crashed", f"worker exited with code {worker.process.exitcode}")
+            if self.memory_limit:
+                rss = rss_bytes(worker.process.pid)
+                if rss and rss > self.memory_limit:
+                    raise ExtractionLimitError("memory", f"worker RSS reached {rss // (1024 * 1024)} MB")
+            if deadline and time.monotonic() > deadline:
+                raise ExtractionLimitError("timeout", f"job ran longer than {self.timeout:g}s")
+        try:
+            return worker.conn.recv()
+        except EOFError:
+            raise ExtractionLimitError("crashed", f"worker exited with code {worker.process.exitcode}")
+
+    def run(self, job, source, **kwargs):
+        """Run one extraction job in a worker process.
+
+        source is the path of a PDF on disk, which the worker opens itself,
+        or a buffer of PDF bytes, which is sent over the pipe.
+        """
+        self.start()
+        worker = self._idle.get()
+        healthy = False
+        try:
+            path = source if isinstance(source, str) else None
+            worker.conn.send((job, kwargs, path))
+            if path is None:
+                worker.conn.send_bytes(source)
+            status, result = self._wait_for_result(worker)
+            worker.jobs += 1
+            self._count("jobs")
+            if status == "ok":
+                healthy = True
+                return result
+            if status == "failed":
+                healthy = True
+            raise ExtractionLimitError(status, result)
+        except ExtractionLimitError as e:
+            self._count(e.kind)
+            logger.error(f"Sandboxed {job} extraction stopped: {e.kind} ({e.message})")
+            raise
+        except (OSError, EOFError) as e:
+            self._count("crashed")
+            raise ExtractionLimitError("crashed", str(e))
+        finally:
+            if healthy and worker.jobs < self.max_jobs:
+                self._idle.put(worker)
+            else:
+                # Recycle after max_jobs to shed fragmentation, or replace a bad worker
+                if healthy:
+                    self._count("recycled")
+                self._retire(worker, kill=not healthy)
+                self._idle.put(self._spawn())
+
+    def _run_with_profiles(self, job, source, **kwargs):
+        """Run a job that extracts tables, sharing learned profiles both ways"""
+        with self._profiles_lock:
+            profiles = dict(self._profiles)
+        tables, learned = self.run(job, source, profiles=profiles, **kwargs)
+        with self._profiles_lock:
+            self._profiles.update(learned)
+        return tables
+
+    def extract_tables(self, source, report_version=None):
+        """Sandboxed extract_tables_from_pdf"""
+        return self._run_with_profiles("tables", source, report_version=report_version)
+
+    def extract_metadata(self, source, filename):
+        """Sandboxed extract_metadata"""
+        return self.run("metadata", source, filename=filename)
+
+    def run_engine(self, source, engine):
+        """Sandboxed call of an extraction engine, a module-level engine(file) -> tables"""
+        return self._run_with_profiles("engine", source, engine=engine)
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from utils.storage import BufferReader
+from utils.processing import extract_tables_from_pdf, process_table_data, analyze_failures
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+ROW_KEY = ["Harmonic", "Time Percent Limit[%]"]
+VIOLATION_KEY = ["Table", "Harmonic", "Phase", "Time Limit (%)"]
+MAX_SAMPLE_DIFFS = 10
+
+def reference_engine(file):
+    """Today's extractor: the full structured + text pass, no learned profiles"""
+    return extract_tables_from_pdf(file, use_profiles=False)
+
+def profiled_engine(file):
+    """Extractor using learned layout profiles (single-strategy fast path)"""
+    return extract_tables_from_pdf(file)
+
+# Candidate engines that can be shadowed against the reference, by name.
+# An engine takes a file path or file object and returns the same
+# {table name: rows} mapping as extract_tables_from_pdf. Engines must be
+# module-level functions so the app can run them in the extraction sandbox.
+SHADOW_ENGINES = {
+    "profiled": profiled_engine,
+}
+
+def register_engine(name, func):
+    """Make a candidate extraction engine available to the shadow runner"""
+    SHADOW_ENGINES[name] = func
+
+def _diff_table(ref_df, cand_df):
+    """Row-by-row diff of two processed tables keyed on harmonic and time limit"""
+    ref = ref_df.set_index(ROW_KEY)
+    cand = cand_df.set_index(ROW_KEY)
+
+    missing = ref.index.difference(cand.index)
+    extra = cand.index.difference(ref.index)
+    common = ref.index.intersection(cand.index)
+
+    changed = []
+    if len(common):
+        ref_common = ref.loc[common].astype(str)
+        cand_common = cand.loc[common, ref.columns].astype(str)
+        mask = ref_common.ne(cand_common)
+        for key in mask.index[mask.any(axis=1)]:
+            cols = list(mask.columns[mask.loc[key]])
+            changed.append({
+                "key": [float(k) for k in key],
+                "columns": {col: [ref_common.at[key, col], cand_common.at[key, col]] for col in cols},
+            })
+
+    return {
+        "reference_rows": len(ref),
+        "candidate_rows": len(cand),
+        "missing": len(missing),
+        "extra": len(extra),
+        "changed": len(changed),
+        "samples": {
+            "missing": [[float(k) for k in key] for key in missing[:MAX_SAMPLE_DIFFS]],
+            "extra": [[float(k) for k in key] for key in extra[:MAX_SAMPLE_DIFFS]],
+            "changed": changed[:MAX_SAMPLE_DIFFS],
+        },
+    }
+
+def _violations(tables):
+    """All violations for a set of raw tables, tagged with their table"""
+    violations = []
+    for table_name, table_data in tables.items():
+        if table_data:
+            df = process_table_data(table_data, table_name)
+            if not df.empty:
+                table_violations = analyze_failures(df)
+                if not table_violations.empty:
+                    table_violations['Table'] = table_name
+                    violations.append(table_violations)
+    return pd.concat(violations) if violations else pd.DataFrame(columns=VIOLATION_KEY)
+
+def compare_tables(ref_tables, cand_tables):
+    """Diff processed tables and violations from the reference and a candidate"""
+    tables = {}
+    for table_name in sorted(set(ref_tables) | set(cand_tables)):
+        ref_df = process_table_data(ref_tables.get(table_name, []), table_name)
+        cand_df = process_table_data(cand_tables.get(table_name, []), table_name)
+        tables[table_name] = _diff_table(ref_df, cand_df)
+
+    ref_keys = set(map(tuple, _violations(ref_tables)[VIOLATION_KEY].astype(str).values))
+    cand_keys = set(map(tuple, _violations(cand_tables)[VIOLATION_KEY].astype(str).values))
+    violations = {
+        "reference": len(ref_keys),
+        "candidate": len(cand_keys),
+        "missing": sorted(ref_keys - cand_keys)[:MAX_SAMPLE_DIFFS],
+        "extra": sorted(cand_keys - ref_keys)[:MAX_SAMPLE_DIFFS],
+    }
+
+    mismatch = (
+        any(t["missing"] or t["extra"] or t["changed"] for t in tables.values())
+        or ref_keys != cand_keys
+    )
+    return {"tables": tables, "violations": violations, "mismatch": mismatch}
+
+def _timed(run):
+    """Run one extraction and return (tables, seconds)"""
+    start = time.perf_counter()
+    tables = run()
+    return tables, time.perf_counter() - start
+
+def run_shadow(open_file, engine_name, label=None, run_engine=None):
+    """Run the reference and a candidate engine on the same input and diff them.
+
+    open_file is a callable returning a fresh path or file object, so each
+    engine reads the input from the start. run_engine, when given, is called
+    as run_engine(engine) instead of engine(open_file()); the app uses it to
+    run both passes in the extraction sandbox.
+    """
+    if run_engine is None:
+        run_engine = lambda engine: engine(open_file())
+    record = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "input": label,
+        "engine": engine_name,
+    }
+    try:
+        engine = SHADOW_ENGINES[engine_name]
+        ref_tables, ref_seconds = _timed(lambda: run_engine(reference_engine))
+        cand_tables, cand_seconds = _timed(lambda: run_engine(engine))
+        record.update({
+            "reference_seconds": round(ref_seconds, 4),
+            "candidate_seconds": round(cand_seconds, 4),
+            "speedup": round(ref_seconds / cand_seconds, 2) if cand_seconds else None,
+        })
+        record.update(compare_tables(ref_tables, cand_tables))
+    except Exception as e:
+        logger.error(f"Shadow run of {engine_name} on {label} failed: {str(e)}", exc_info=True)
+        record.update({"mismatch": True, "error": str(e)})
+    return record
+
+def append_record(report_path, record):
+    """Append one shadow record to a JSON lines report"""
+    with open(report_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+class ShadowRunner:
+    """Samples production requests and shadows a candidate engine in the background.
+
+    The user-facing response never waits on the shadow run; results are
+    appended to a JSON lines report. With a pool, both engines run in the
+    extraction sandbox; with an admission controller, a shadow run needs a
+    free slot. At most one run is in flight: a sample arriving meanwhile, or
+    while no slot is free, is dropped rather than queued.
+    """
+
+    def __init__(self, engine_name, sample_rate=0.0, report_path='shadow_report.jsonl',
+                 pool=None, admission=None):
+        if engine_name not in SHADOW_ENGINES:
+            raise ValueError(f"Unknown shadow engine: {engine_name}")
+        self.engine_name = engine_name
+        self.sample_rate = sample_rate
+        self.report_path = report_path
+        self.pool = pool
+        self.admission = admission
+        self.dropped = 0
+        self._in_flight = False
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+
+    def maybe_submit(self, source, label=None):
+        """Start a shadow run for a sampled share of calls; returns the future or None.
+
+        source is a PDF path or buffer. Buffers other than bytes are copied:
+        an upload's mmap can be closed by cache eviction mid-run.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        with self._state_lock:
+            if self._in_flight:
+                self.dropped += 1
+                return None
+            admitted_at = None
+            if self.admission is not None:
+                admitted_at = self.admission.try_acquire()
+                if admitted_at is None:
+                    self.dropped += 1
+                    return None
+            self._in_flight = True
+        if not isinstance(source, (str, bytes)):
+            source = bytes(source)
+        return self._executor.submit(self._run_and_record, source, label, admitted_at)
+
+    def _run_and_record(self, source, label, admitted_at):
+        try:
+            run_engine = None
+            if self.pool is not None:
+                run_engine = lambda engine: self.pool.run_engine(source, engine)
+            open_file = (lambda: source) if isinstance(source, str) else (lambda: BufferReader(source))
+            record = run_shadow(open_file, self.engine_name, label, run_engine)
+            self.record(record)
+            if record.get("mismatch"):
+                logger.warning(f"Shadow engine {self.engine_name} mismatched reference on {label}")
+            return record
+        finally:
+            if admitted_at is not None:
+                self.admission.release(admitted_at)
+            with self._state_lock:
+                self._in_flight = False
+
+    def record(self, record):
+        with self._lock:
+            append_record(self.report_path, record)
+
+def summarize_records(records):
+    """Aggregate shadow records into mismatch counts and timing totals"""
+    records = list(records)
+    timed = [r for r in records if "reference_seconds" in r]
+    ref_total = sum(r["reference_seconds"] for r in timed)
+    cand_total = sum(r["candidate_seconds"] for r in timed)
+    return {
+        "runs": len(records),
+        "mismatches": sum(1 for r in records if r.get("mismatch")),
+        "errors": sum(1 for r in records if "error" in r),
+        "reference_seconds": round(ref_total, 4),
+        "candidate_seconds": round(cand_total, 4),
+        "speedup": round(ref_total / cand_total, 2) if cand_total else None,
+    }
+
+def run_corpus(paths, engine_name, report_path=None):
+    """Shadow a candidate engine over a stored corpus of PDFs"""
+    records = []
+    for path in paths:
+        record = run_shadow(lambda: path, engine_name, label=os.path.basename(path))
+        records.append(record)
+        logger.info(f"{os.path.basename(path)}: mismatch={record.get('mismatch')} "
+                    f"speedup={record.get('speedup')}")
+        if report_path:
+            append_record(report_path, record)
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff a candidate extraction engine against the reference")
+    parser.add_argument("corpus", help="PDF file or directory of PDFs")
+    parser.add_argument("--engine", default="profiled", choices=sorted(SHADOW_ENGINES))
+    parser.add_argument("--report", help="Append per-file records to this JSON lines file")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.corpus):
+        paths = sorted(
+            os.path.join(args.corpus, name) for name in os.listdir(args.corpus)
+            if name.lower().endswith('.pdf')
+        )
+    else:
+        paths = [args.corpus]
+
+    records = run_corpus(paths, args.engine, args.report)
+    summary = summarize_records(records)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["mismatches"] else 0
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import io
+import os
+import mmap
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+IN_MEMORY_LIMIT = 4 * 1024 * 1024          # uploads up to this size stay as bytes
+CACHE_LIMIT = 256 * 1024 * 1024            # total bytes kept resident across uploads
+COPY_CHUNK_SIZE = 1024 * 1024
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file object over a shared buffer.
+
+    Each reader keeps its own position, so the hash, the metadata pass and
+    the table pass can all read the same bytes or mmap without copying it.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return self._pos
+
+    def readinto(self, b):
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        data = self._view[self._pos:end].tobytes()
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        try:
+            self._view.release()
+        except BufferError:
+            pass
+        super().close()
+
+class Upload:
+    """An uploaded PDF held in memory or memory-mapped, with its content hash.
+
+    path is set once the upload folder holds exactly these bytes, so other
+    processes can open the file instead of being sent a copy.
+    """
+
+    def __init__(self, filename, buffer, mapped=False, path=None):
+        self.filename = filename
+        self.buffer = buffer
+        self.size = len(buffer)
+        self.in_memory = not mapped
+        self.path = path
+        self.sha256 = hashlib.sha256(memoryview(buffer)).hexdigest()
+
+    def open(self):
+        """Return an independent file object for pdfplumber.open"""
+        return BufferReader(self.buffer)
+
+    def close(self):
+        """Unmap a memory-mapped upload; one still being read is left to the GC"""
+        if self.in_memory:
+            return
+        try:
+            self.buffer.close()
+        except BufferError:
+            pass
+
+def _map_file(fileobj):
+    """Memory-map a real file; returns None when the object has no usable fd"""
+    try:
+        fileno = fileobj.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    try:
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return None
+
+def _spool_to_mmap(stream):
+    """Copy a non-file stream into an anonymous temp file and map it"""
+    spool = tempfile.TemporaryFile()
+    while True:
+        chunk = stream.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        spool.write(chunk)
+    spool.flush()
+    mapped = _map_file(spool)
+    spool.close()
+    return mapped
+
+class UploadStore:
+    """Keeps uploads resident for the extraction routes and persists them in the background.
+
+    Small uploads are read once into bytes; large ones are memory-mapped from
+    werkzeug's spooled temp file (or a private temp file) so extraction never
+    waits on the upload volume. Disk writes to the upload folder happen on a
+    single background thread; routes wait for an upload's write with
+    flush() before handing its name to a request that may land on another
+    worker. The store falls back to mapping the persisted file when an
+    upload is not resident in this worker. Both kinds count toward
+    cache_limit, and evicted or replaced mmaps are closed.
+    """
+
+    def __init__(self, upload_folder, in_memory_limit=IN_MEMORY_LIMIT, cache_limit=CACHE_LIMIT):
+        self.upload_folder = upload_folder
+        self.in_memory_limit = in_memory_limit
+        self.cache_limit = cache_limit
+        self._uploads = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload-writer")
+
+    def path_for(self, filename):
+        return os.path.join(self.upload_folder, filename)
+
+    def add(self, filename, file_storage):
+        """Take ownership of an uploaded FileStorage and schedule persistence"""
+        stream = file_storage.stream
+        stream.seek(0, io.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+
+        mapped = None
+        if size > self.in_memory_limit:
+            mapped = _map_file(stream) or _spool_to_mmap(stream)
+
+        if mapped is not None:
+            upload = Upload(filename, mapped, mapped=True)
+        else:
+            stream.seek(0)
+            upload = Upload(filename, stream.read())
+
+        with self._lock:
+            replaced = self._uploads.pop(filename, None)
+            if replaced is not None:
+                # The file on disk is about to hold the new content
+                replaced.path = None
+            self._uploads[filename] = upload
+            future = self._writer.submit(self._persist, upload)
+            self._pending[filename] = future
+        future.add_done_callback(lambda f, name=filename: self._clear_pending(name, f))
+        if replaced is not None:
+            # Writes run in order on one thread, so the old content's write
+            # (if still queued) has finished once this one has
+            future.add_done_callback(lambda f: replaced.close())
+        with self._lock:
+            evicted = self._evict()
+        for stale in evicted:
+            stale.close()
+
+        logger.debug(f"Stored upload {filename} ({size} bytes, "
+                     f"{'memory' if upload.in_memory else 'mmap'}, sha256={upload.sha256[:12]})")
+        return upload
+
+    def _persist(self, upload):
+        """Write an upload to the upload folder atomically"""
+        path = self.path_for(upload.filename)
+        tmp_path = f"{path}.part"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(memoryview(upload.buffer))
+            os.replace(tmp_path, path)
+            with self._lock:
+                if self._uploads.get(upload.filename) is upload:
+                    upload.path = path
+            logger.debug(f"Persisted upload {upload.filename} to {path}")
+        except Exception as e:
+            logger.error(f"Failed to persist upload {upload.filename}: {str(e)}", exc_info=True)
+            raise
+
+    def _clear_pending(self, filename, future):
+        with self._lock:
+            if self._pending.get(filename) is future:
+                del self._pending[filename]
+
+    def _evict(self):
+        """Drop least recently used uploads beyond the cache limit (lock held).
+
+        Uploads still waiting to be written are kept; the evicted ones are
+        returned for the caller to close outside the lock.
+        """
+        resident = sum(u.size for u in self._uploads.values())
+        evicted = []
+        for filename in list(self._uploads):
+            if resident <= self.cache_limit or len(self._uploads) <= 1:
+                break
+            if filename in self._pending:
+                continue
+            upload = self._uploads.pop(filename)
+            resident -= upload.size
+            evicted.append(upload)
+        return evicted
+
+    def get(self, filename):
+        """Return the Upload for a filename, mapping it from disk if needed"""
+        with self._lock:
+            upload = self._uploads.get(filename)
+            if upload is not None:
+                self._uploads.move_to_end(filename)
+                return upload
+            pending = self._pending.get(filename)
+
+        if pending is not None:
+            try:
+                pending.result()
+            except Exception:
+                return None
+
+        path = self.path_for(filename)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            mapped = _map_file(f)
+            if mapped is not None:
+                upload = Upload(filename, mapped, mapped=True, path=path)
+            else:
+                upload = Upload(filename, f.read(), path=path)
+
+        with self._lock:
+            # Another request may have mapped the same file meanwhile
+            existing = self._uploads.get(filename)
+            if existing is None:
+                self._uploads[filename] = upload
+                evicted = self._evict()
+            else:
+                self._uploads.move_to_end(filename)
+        if existing is not None:
+            upload.close()
+            return existing
+        for stale in evicted:
+            stale.close()
+        return upload
+
+    def exists(self, filename):
+        with self._lock:
+            if filename in self._uploads or filename in self._pending:
+                return True
+        return os.path.exists(self.path_for(filename))
+
+    def flush(self, filenames=None):
+        """Block until scheduled disk writes (all, or just these files) have finished.
+
+        Raises the write error of a failed upload.
+        """
+        with self._lock:
+            if filenames is None:
+                pending = list(self._pending.values())
+            else:
+                pending = [self._pending[name] for name in filenames if name in self._pending]
+        for future in pending:
+            future.result()
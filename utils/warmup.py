@@ -0,0 +1,93 @@
+import os
+import gc
+import io
+import time
+import logging
+import importlib
+from utils.sandbox import rss_bytes, start_forkserver
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Constants
+HEAVY_MODULES = ['pandas', 'pdfplumber', 'openpyxl', 'utils.processing', 'utils.export', 'utils.rollup']
+WARM_UP_FILENAME = 'WARM UP DAY 1.pdf'
+WARM_UP_PAGES = [
+    ["WARM UP TATA",
+     "Start time: 01-01-2025 00:00:00 AM End time: 01-02-2025 00:00:00 AM GMT: +05:30 Report Version: 2.1"],
+    ["HARMONIC VOLTAGE DAILY",
+     "2 95 1.0 0.42 0.38 0.51 Pass(42.00%) Pass(38.00%) Pass(51.00%)",
+     "3 95 1.0 1.12 0.44 0.47 Fail(112.00%) Pass(44.00%) Pass(47.00%)"],
+]
+
+def _warm_up_pdf(pages=WARM_UP_PAGES):
+    """Minimal text-only PDF in the report layout, used to prime the extraction path"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        text = "\n".join(["BT /F1 8 Tf 40 800 Td 10 TL"] + [f"({line}) Tj T*" for line in lines] + ["ET"])
+        objects.append("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(text)} >>\nstream\n{text}\nendstream")
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return pdf
+
+def warm_up(app):
+    """Import and exercise the extraction stack ahead of forking web workers.
+
+    Run once in the master process (see wsgi.py, served with
+    gunicorn --preload) so every worker inherits the imported modules and
+    primed caches copy-on-write instead of paying for them on its first
+    request. The sandbox pool's fork server is started here too, so every
+    web worker forks its extraction processes from one server that has
+    already imported the extraction stack; the pool's workers themselves
+    belong to each web worker and start on first use.
+    """
+    started = time.perf_counter()
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+    imported = time.perf_counter()
+
+    from utils.processing import (extract_metadata, extract_tables_from_pdf, process_table_data,
+                                  analyze_failures, create_excel_download)
+    pdf = _warm_up_pdf()
+    try:
+        extract_metadata(io.BytesIO(pdf), WARM_UP_FILENAME)
+        # Profiles are keyed by layout; keep the synthetic one out of the cache
+        tables = extract_tables_from_pdf(io.BytesIO(pdf), use_profiles=False)
+        for table_name, table_data in tables.items():
+            if table_data:
+                analyze_failures(process_table_data(table_data, table_name))
+        create_excel_download(tables, WARM_UP_FILENAME)
+    except Exception as e:
+        logger.warning(f"Warm-up extraction failed, continuing cold: {str(e)}")
+
+    # Move everything allocated so far out of the collector's reach so GC
+    # passes in forked workers do not touch (and so copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    if app.extensions.get('extraction_pool') is not None:
+        app.extensions['startup']['forkserver_pid'] = start_forkserver()
+
+    finished = time.perf_counter()
+    app.extensions['startup'].update({
+        'warm_up_import_seconds': round(imported - started, 4),
+        'warm_up_seconds': round(finished - started, 4),
+        'rss_mb_after_warm_up': round((rss_bytes(os.getpid()) or 0) / (1024 * 1024), 1),
+    })
+    logger.info(f"Warmed up extraction in {app.extensions['startup']['warm_up_seconds']}s")
+    return app
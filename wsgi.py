@@ -0,0 +1,8 @@
+# Production entry point: WEB_CONCURRENCY=<workers> gunicorn --preload wsgi:app
+# The master builds and warms the app once; workers fork from it.
+# WEB_CONCURRENCY sets gunicorn's worker count and splits the extraction
+# concurrency default across workers.
+from app import create_app
+from utils.warmup import warm_up
+
+app = warm_up(create_app())